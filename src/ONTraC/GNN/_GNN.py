@@ -1,5 +1,5 @@
 import random
-from optparse import Values
+from argparse import Namespace
 from typing import Callable, Dict, List, Optional, Tuple, Type
 
 import numpy as np
@@ -12,9 +12,10 @@ from torch_geometric.loader import DenseDataLoader
 from ..data import SpatailOmicsDataset, load_dataset
 from ..log import info
 from ..train import SubBatchTrainProtocol
+from ..utils import get_niche_to_cell_matrix
 
 
-def load_data(options: Values) -> Tuple[SpatailOmicsDataset, DenseDataLoader]:
+def load_data(options: Namespace) -> Tuple[SpatailOmicsDataset, DenseDataLoader]:
     """
     Load data and create sample loader
     :param options: options
@@ -25,7 +26,9 @@ def load_data(options: Values) -> Tuple[SpatailOmicsDataset, DenseDataLoader]:
 
     dataset = load_dataset(options=options)
     batch_size = options.batch_size if options.batch_size > 0 else len(dataset)
-    sample_loader = DenseDataLoader(dataset, batch_size=batch_size)
+    # pinned host memory lets batches be copied to the GPU asynchronously
+    pin_memory = torch.device(options.device).type == 'cuda'
+    sample_loader = DenseDataLoader(dataset, batch_size=batch_size, pin_memory=pin_memory)
 
     return dataset, sample_loader
 
@@ -41,7 +44,7 @@ def set_seed(seed: int) -> None:
     np.random.seed(seed)
 
 
-def train(options: Values,
+def train(options: Namespace,
           nn_model: torch.nn.Module,
           BatchTrain: Type[SubBatchTrainProtocol],
           sample_loader: DenseDataLoader,
@@ -64,6 +67,7 @@ def train(options: Values,
                       min_delta=options.min_delta,
                       min_epochs=options.min_epochs,
                       output=options.GNN_dir,
+                      mixed_precision=options.mixed_precision,
                       **loss_weight_args)
     batch_train.save(path=f'{options.GNN_dir}/model_state_dict.pt')
     info(message=f'Training process end.')
@@ -146,8 +150,8 @@ def save_graph_pooling_results(ori_data_df: pd.DataFrame, dataset: SpatailOmicsD
     :return: None
     """
 
-    consolidate_s_niche_df = pd.DataFrame()
-    consolidate_s_cell_df = pd.DataFrame()
+    consolidate_s_niche_df_list = []
+    consolidate_s_cell_df_list = []
     for i, data in enumerate(dataset):
         # the slice of data in each sample
         slice_ = slice(i * data.x.shape[0], i * data.x.shape[0] + data.mask.sum())
@@ -155,20 +159,21 @@ def save_graph_pooling_results(ori_data_df: pd.DataFrame, dataset: SpatailOmicsD
         consolidate_s_df_ = pd.DataFrame(consolidate_s,
                                          columns=[f'NicheCluster_{i}' for i in range(consolidate_s.shape[1])])
         consolidate_s_df_['Cell_ID'] = ori_data_df[ori_data_df['Sample'] == data.name]['Cell_ID'].values
-        consolidate_s_niche_df = pd.concat([consolidate_s_niche_df, consolidate_s_df_], axis=0)
+        consolidate_s_niche_df_list.append(consolidate_s_df_)
 
         # niche to cell matrix
         niche_weight_matrix = load_npz(rel_params['Data'][i]['NicheWeightMatrix'])
-        niche_to_cell_matrix = (
-            niche_weight_matrix /
-            niche_weight_matrix.sum(axis=0)).T  # normalize by the all niches associated with each cell, N x N
+        niche_to_cell_matrix = get_niche_to_cell_matrix(niche_weight_matrix)  # N x N, sparse
 
         consolidate_s_cell = niche_to_cell_matrix @ consolidate_s
         consolidate_s_cell_df_ = pd.DataFrame(consolidate_s_cell,
                                               columns=[f'NicheCluster_{i}' for i in range(consolidate_s_cell.shape[1])])
         consolidate_s_cell_df_['Cell_ID'] = ori_data_df[ori_data_df['Sample'] == data.name]['Cell_ID'].values
-        consolidate_s_cell_df = pd.concat([consolidate_s_cell_df, consolidate_s_cell_df_], axis=0)
+        consolidate_s_cell_df_list.append(consolidate_s_cell_df_)
 
+    # concatenate once instead of copying the growing tables for each sample
+    consolidate_s_niche_df = pd.concat(consolidate_s_niche_df_list, axis=0)
+    consolidate_s_cell_df = pd.concat(consolidate_s_cell_df_list, axis=0)
     consolidate_s_niche_df = consolidate_s_niche_df.set_index('Cell_ID')
     consolidate_s_niche_df = consolidate_s_niche_df.loc[ori_data_df['Cell_ID'], :]
     consolidate_s_niche_df.to_csv(f'{output_dir}/niche_level_niche_cluster.csv.gz',
@@ -1,13 +1,12 @@
-from copy import deepcopy
 from typing import Optional, Tuple
 
 import matplotlib as mpl
 import numpy as np
 import pandas as pd
 
-mpl.rcParams['pdf.fonttype'] = 42
-mpl.rcParams['ps.fonttype'] = 42
-mpl.rcParams['font.family'] = 'Arial'
+from .constants import MPL_RC_PARAMS
+
+mpl.rcParams.update(MPL_RC_PARAMS)
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -53,6 +52,7 @@ def plot_violin_cell_type_along_NT_score(ana_data: AnaData) -> Optional[Tuple[pl
     fig.tight_layout()
     if ana_data.options.output is not None:
         fig.savefig(f'{ana_data.options.output}/cell_type_along_NT_score_violin.pdf', transparent=True)
+        plt.close(fig)
         return None
     else:
         return fig, ax
@@ -81,6 +81,7 @@ def plot_kde_cell_type_along_NT_score(ana_data: AnaData) -> Optional[Tuple[plt.F
     fig.tight_layout()
     if ana_data.options.output is not None:
         fig.savefig(f'{ana_data.options.output}/cell_type_along_NT_score_kde.pdf', transparent=True)
+        plt.close(fig)
         return None
     else:
         return fig, ax
@@ -117,6 +118,7 @@ def plot_hist_cell_type_along_NT_score(ana_data: AnaData) -> Optional[Tuple[plt.
     fig.tight_layout()
     if ana_data.options.output is not None:
         fig.savefig(f'{ana_data.options.output}/cell_type_along_NT_score_hist.pdf', transparent=True)
+        plt.close(fig)
         return None
     else:
         return fig, ax
@@ -133,41 +135,38 @@ def plot_cell_type_along_NT_score(ana_data: AnaData) -> None:
 
 
 def plot_cell_type_loading_in_niche_clusters(ana_data: AnaData,
-                                             cell_type_dis_df: pd.DataFrame) -> Optional[sns.FacetGrid]:  #,
-    #  nc_order: List[str]) -> Optional[sns.FacetGrid]:
+                                             cell_type_dis_df: pd.DataFrame) -> Optional[Tuple[plt.Figure, plt.Axes]]:
     """
-    Plot cell type loading in each niche cluster.
+    Plot cell type loading in each niche cluster as one stacked bar per niche cluster.
     :param ana_data: AnaData, the data for analysis.
     :param cell_type_dis_df: pd.DataFrame, the cell type distribution in each niche cluster.
-    :param nc_order: List[str], the order of niche cluster.
     :return: None or Tuple[plt.Figure, plt.Axes]
     """
 
-    data_df = deepcopy(cell_type_dis_df)
-    cell_type = data_df.columns
-    data_df['cluster'] = data_df.index
-    cell_type_dis_melt_df = pd.melt(
-        data_df,
-        id_vars='cluster',  # type: ignore
-        var_name='Cell type',
-        value_vars=cell_type,  # type: ignore
-        value_name='Number')
-    # g = sns.catplot(cell_type_dis_melt_df, kind="bar", x="Number", y="Cell type", col="cluster", col_order= nc_order, height=4,
-    g = sns.catplot(cell_type_dis_melt_df,
-                    kind="bar",
-                    x="Number",
-                    y="Cell type",
-                    col="cluster",
-                    height=2 + len(cell_type) / 6,
-                    aspect=.5)  # type: ignore
-    g.add_legend()
-    g.tight_layout()
-    g.set_xticklabels(rotation='vertical')
+    cell_type = cell_type_dis_df.columns.astype(str)
+    loadings = cell_type_dis_df.values  # n_clusters x n_cell_types
+    n_clusters, n_cell_types = loadings.shape
+    colors = sns.color_palette(n_colors=n_cell_types) if n_cell_types <= 10 else sns.color_palette(
+        'husl', n_colors=n_cell_types)
+
+    # one stacked bar for each niche cluster
+    fig, ax = plt.subplots(figsize=(2 + n_clusters / 2, max(4, 0.3 * n_cell_types)))
+    bottom = np.zeros(n_clusters)
+    for i in range(n_cell_types):
+        ax.bar(np.arange(n_clusters), loadings[:, i], bottom=bottom, color=colors[i], label=cell_type[i])
+        bottom += loadings[:, i]
+    ax.set_xticks(np.arange(n_clusters))
+    ax.set_xticklabels(cell_type_dis_df.index.astype(str), rotation=45, horizontalalignment='right')
+    ax.set_xlabel('Niche Cluster')
+    ax.set_ylabel('Number')
+    ax.legend(title='Cell type', loc='upper left', bbox_to_anchor=(1, 1), frameon=False)
+    fig.tight_layout()
     if ana_data.options.output is not None:
-        g.savefig(f'{ana_data.options.output}/cell_type_loading_in_niche_clusters.pdf', transparent=True)
+        fig.savefig(f'{ana_data.options.output}/cell_type_loading_in_niche_clusters.pdf', transparent=True)
+        plt.close(fig)
         return None
     else:
-        return g
+        return fig, ax
 
 
 def plot_cell_type_dis_in_niche_clusters(ana_data: AnaData,
@@ -179,12 +178,13 @@ def plot_cell_type_dis_in_niche_clusters(ana_data: AnaData,
     :return: None or Tuple[plt.Figure, plt.Axes]
     """
     fig, ax = plt.subplots(figsize=(2 + cell_type_dis_df.shape[1] / 3, 4))
-    sns.heatmap(cell_type_dis_df.apply(lambda x: x / x.sum(), axis=1), ax=ax)
+    sns.heatmap(cell_type_dis_df.div(cell_type_dis_df.sum(axis=1), axis=0), ax=ax)
     ax.set_xlabel('Cell Type')
     ax.set_ylabel('Niche Cluster')
     fig.tight_layout()
     if ana_data.options.output is not None:
         fig.savefig(f'{ana_data.options.output}/cell_type_dis_in_niche_clusters.pdf', transparent=True)
+        plt.close(fig)
         return None
     else:
         return fig, ax
@@ -199,12 +199,13 @@ def plot_cell_type_across_niche_cluster(ana_data: AnaData,
     :return: None or Tuple[plt.Figure, plt.Axes]
     """
     fig, ax = plt.subplots(figsize=(2 + cell_type_dis_df.shape[1] / 3, 4))
-    sns.heatmap(cell_type_dis_df.apply(lambda x: x / x.sum(), axis=0), ax=ax)
+    sns.heatmap(cell_type_dis_df.div(cell_type_dis_df.sum(axis=0), axis=1), ax=ax)
     ax.set_xlabel('Cell Type')
     ax.set_ylabel('Niche Cluster')
     fig.tight_layout()
     if ana_data.options.output is not None:
         fig.savefig(f'{ana_data.options.output}/cell_type_dis_across_niche_cluster.pdf', transparent=True)
+        plt.close(fig)
         return None
     else:
         return fig, ax
@@ -232,13 +233,15 @@ def plot_cell_type_with_niche_cluster(ana_data: AnaData) -> None:
 
     # calculate cell type distribution in each niche cluster
     data_df = ana_data.cell_id.join(ana_data.cell_level_niche_cluster_assign)
-    t = pd.CategoricalDtype(categories=ana_data.cell_type_codes['Cell_Type'], ordered=True)
-    cell_type_one_hot = np.zeros(shape=(data_df.shape[0], ana_data.cell_type_codes.shape[0]))
-    cell_type = data_df['Cell_Type'].astype(t)
-    cell_type_one_hot[np.arange(data_df.shape[0]), cell_type.cat.codes] = 1  # N x n_cell_type
-    cell_type_dis = np.matmul(data_df[ana_data.cell_level_niche_cluster_assign.columns].T,
-                              cell_type_one_hot)  # n_clusters x n_cell_types
-    cell_type_dis_df = pd.DataFrame(cell_type_dis)
+    cell_type_codes = pd.Index(ana_data.cell_type_codes['Cell_Type']).get_indexer(data_df['Cell_Type'])  # N
+    niche_cluster_assign = data_df[ana_data.cell_level_niche_cluster_assign.columns]  # N x n_clusters
+    # grouped sum of niche cluster loadings by cell type, same as niche_cluster_assign.T @ one_hot(cell_type)
+    cell_type_dis = np.stack([
+        np.bincount(cell_type_codes,
+                    weights=niche_cluster_assign[cluster].values,
+                    minlength=ana_data.cell_type_codes.shape[0]) for cluster in niche_cluster_assign.columns
+    ])  # n_clusters x n_cell_types
+    cell_type_dis_df = pd.DataFrame(cell_type_dis, index=niche_cluster_assign.columns)
     cell_type_dis_df.columns = ana_data.cell_type_codes['Cell_Type']
     if ana_data.options.output is not None:
         cell_type_dis_df.to_csv(f'{ana_data.options.output}/cell_type_dis_in_niche_clusters.csv', index=False)
@@ -247,7 +250,6 @@ def plot_cell_type_with_niche_cluster(ana_data: AnaData) -> None:
     nc_order = [f'NicheCluster_{x}' for x in nc_scores.argsort()]
     cell_type_dis_df = cell_type_dis_df.loc[nc_order]
 
-    # plot_cell_type_loading_in_niche_clusters(ana_data=ana_data, cell_type_dis_df=cell_type_dis_df, nc_order=nc_order)
     plot_cell_type_loading_in_niche_clusters(ana_data=ana_data, cell_type_dis_df=cell_type_dis_df)
     plot_cell_type_dis_in_niche_clusters(ana_data=ana_data, cell_type_dis_df=cell_type_dis_df)
     plot_cell_type_across_niche_cluster(ana_data=ana_data, cell_type_dis_df=cell_type_dis_df)
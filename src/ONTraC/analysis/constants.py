@@ -1,2 +1,10 @@
+from typing import Any, Dict
+
 NT_SCORE_FEATS = ['Niche_NTScore', 'Cell_NTScore']
-NT_SCORE_FEAT_FILES = ['niche_NTScore.csv', 'cell_NTScore.csv']
\ No newline at end of file
+NT_SCORE_FEAT_FILES = ['niche_NTScore.csv', 'cell_NTScore.csv']
+
+# shared matplotlib settings for the analysis plots, keep text editable in pdf/ps
+MPL_RC_PARAMS: Dict[Any, Any] = {'pdf.fonttype': 42, 'ps.fonttype': 42, 'font.family': 'Arial'}
+
+# resolution of rasterized layers (e.g. large scatter plots) in vector figures
+RASTER_DPI = 300
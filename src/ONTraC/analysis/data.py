@@ -1,5 +1,5 @@
 import os
-from optparse import Values
+from argparse import Namespace
 from typing import Dict, Union
 
 import numpy as np
@@ -7,7 +7,7 @@ import pandas as pd
 from pandas import DataFrame
 
 from ..log import info
-from ..utils import get_rel_params, read_yaml_file
+from ..utils import get_rel_params, read_csv_array, read_yaml_file
 
 
 # ----------------------------
@@ -17,7 +17,7 @@ def load_loss_record_data(options) -> Union[Dict, None]:
     """
     Parse the log file and save the training loss to a csv file.
     Args:
-        options: Values, the options from optparse
+        options: Namespace, the options from argparse
     Returns:
         Dict: {'loss_df': pd.DataFrame, 'loss_dict': Dict}
         loss_df is the training loss dataframe
@@ -70,11 +70,11 @@ def load_loss_record_data(options) -> Union[Dict, None]:
     return {'loss_df': epoch_loss_df, 'loss_dict': final_loss_dict}
 
 
-def load_niche_cluster_connectivity(options: Values) -> np.ndarray:
+def load_niche_cluster_connectivity(options: Namespace) -> np.ndarray:
     """
     Load the niche cluster connectivity from the output of GNN.
     Args:
-        options: Values, the options from optparse
+        options: Namespace, the options from argparse
     Returns:
         np.ndarray: the niche cluster connectivity
     """
@@ -84,14 +84,14 @@ def load_niche_cluster_connectivity(options: Values) -> np.ndarray:
     if not os.path.isfile(niche_cluster_conn_file):  # skip if file not exist
         raise FileNotFoundError(f"Cannot find niche cluster connectivity file: {niche_cluster_conn_file}.")
 
-    return np.loadtxt(f'{niche_cluster_conn_file}', delimiter=',')
+    return read_csv_array(niche_cluster_conn_file, dtype=np.float64)
 
 
-def load_niche_cluster_score(options: Values) -> np.ndarray:
+def load_niche_cluster_score(options: Namespace) -> np.ndarray:
     """
     Load the niche cluster score from the output of NT score.
     Args:
-        options: Values, the options from optparse
+        options: Namespace, the options from argparse
     Returns:
         np.ndarray: the niche cluster score
     """
@@ -101,14 +101,14 @@ def load_niche_cluster_score(options: Values) -> np.ndarray:
     if not os.path.isfile(niche_cluster_score_file):  # skip if file not exist
         raise FileNotFoundError(f"Cannot find niche cluster score file: {niche_cluster_score_file}.")
 
-    return np.loadtxt(f'{niche_cluster_score_file}', delimiter=',')
+    return read_csv_array(niche_cluster_score_file, dtype=np.float64)[:, 0]  # one score per line
 
 
-def load_niche_level_niche_cluster_assign(options: Values) -> pd.DataFrame:
+def load_niche_level_niche_cluster_assign(options: Namespace) -> pd.DataFrame:
     """
     Load the niche cluster assignment for each niche level.
     Args:
-        options: Values, the options from optparse
+        options: Namespace, the options from argparse
     Returns:
         pd.DataFrame: the niche cluster assignment for each niche level
     """
@@ -123,11 +123,11 @@ def load_niche_level_niche_cluster_assign(options: Values) -> pd.DataFrame:
     return pd.read_csv(niche_level_niche_cluster_assign_file, index_col=0)
 
 
-def load_cell_level_niche_cluster_assign(options: Values) -> pd.DataFrame:
+def load_cell_level_niche_cluster_assign(options: Namespace) -> pd.DataFrame:
     """
     Load the niche cluster assignment for each cell level.
     Args:
-        options: Values, the options from optparse
+        options: Namespace, the options from argparse
     Returns:
         pd.DataFrame: the niche cluster assignment for each cell level
     """
@@ -142,11 +142,11 @@ def load_cell_level_niche_cluster_assign(options: Values) -> pd.DataFrame:
     return pd.read_csv(cell_level_niche_cluster_assign_file, index_col=0)
 
 
-def load_niche_level_max_niche_cluster(options: Values) -> pd.DataFrame:
+def load_niche_level_max_niche_cluster(options: Namespace) -> pd.DataFrame:
     """
     Load the max niche cluster assignment for each niche level.
     Args:
-        options: Values, the options from optparse
+        options: Namespace, the options from argparse
     Returns:
         pd.DataFrame: the max niche cluster assignment for each niche level
     """
@@ -161,11 +161,11 @@ def load_niche_level_max_niche_cluster(options: Values) -> pd.DataFrame:
     return pd.read_csv(niche_level_max_niche_cluster_file, index_col=0)
 
 
-def load_cell_level_max_niche_cluster(options: Values) -> pd.DataFrame:
+def load_cell_level_max_niche_cluster(options: Namespace) -> pd.DataFrame:
     """
     Load the max niche cluster assignment for each cell level.
     Args:
-        options: Values, the options from optparse
+        options: Namespace, the options from argparse
     Returns:
         pd.DataFrame: the max niche cluster assignment for each cell level
     """
@@ -188,7 +188,7 @@ class AnaData:
     """
     Class to store the data for analysis
     This class have the following attributes:
-    - options: Values, the options from optparse
+    - options: Namespace, the options from argparse
     - rel_params: Dict, the relative paths for params
     - cell_id: pd.DataFrame, the original Cell ID and Cell Type
     - train_loss: Dict, the training loss
@@ -203,7 +203,7 @@ class AnaData:
     - cell_level_max_niche_cluster: pd.DataFrame, the max niche cluster assignment for each cell level
     """
 
-    def __init__(self, options: Values) -> None:
+    def __init__(self, options: Namespace) -> None:
         """
         Initialize the class with the options"""
 
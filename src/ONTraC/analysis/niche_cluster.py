@@ -7,15 +7,15 @@ import pandas as pd
 from matplotlib.cm import ScalarMappable
 from matplotlib.colors import Normalize
 
-mpl.rcParams['pdf.fonttype'] = 42
-mpl.rcParams['ps.fonttype'] = 42
-mpl.rcParams['font.family'] = 'Arial'
+from .constants import MPL_RC_PARAMS, RASTER_DPI
+
+mpl.rcParams.update(MPL_RC_PARAMS)
 import matplotlib.pyplot as plt
 import seaborn as sns
 
 from ..log import warning
 from .data import AnaData
-from .utils import gini
+from .utils import close_sample_figures, gini_along_axis
 
 
 def plot_niche_cluster_connectivity(ana_data: AnaData) -> Optional[Tuple[plt.Figure, plt.Axes]]:
@@ -36,14 +36,15 @@ def plot_niche_cluster_connectivity(ana_data: AnaData) -> Optional[Tuple[plt.Fig
 
     # position
     pos = nx.spring_layout(G, seed=42)
-    # edges
-    edges = G.edges()
-    weights = [G[u][v]['weight'] for u, v in edges]
+    # edges, read weights from the matrix in one step
+    # for an undirected graph built from a matrix, networkx keeps the weight of the (v, u) entry
+    edges = np.array(G.edges(), dtype=np.intp).reshape(-1, 2)
+    weights = ana_data.niche_cluster_connectivity[edges[:, 1], edges[:, 0]]
     # node color
     norm = Normalize(vmin=0, vmax=1)
     sm = ScalarMappable(cmap=plt.cm.rainbow, norm=norm)  # type: ignore
     nc_scores = 1 - ana_data.niche_cluster_score if ana_data.options.reverse else ana_data.niche_cluster_score
-    niche_cluster_colors = [sm.to_rgba(nc_scores[n]) for n in G.nodes]
+    niche_cluster_colors = sm.to_rgba(nc_scores[list(G.nodes)])  # one RGBA row for each node
 
     fig, ax = plt.subplots(figsize=(6, 6))
     nx.draw(
@@ -61,6 +62,7 @@ def plot_niche_cluster_connectivity(ana_data: AnaData) -> Optional[Tuple[plt.Fig
     fig.tight_layout()
     if ana_data.options.output is not None:
         fig.savefig(f'{ana_data.options.output}/cluster_connectivity.pdf')
+        plt.close(fig)
         return None
     else:
         return fig, ax
@@ -84,7 +86,7 @@ def plot_cluster_proportion(ana_data: AnaData) -> Optional[Tuple[plt.Figure, plt
     norm = Normalize(vmin=0, vmax=1)
     sm = ScalarMappable(cmap=plt.cm.rainbow, norm=norm)  # type: ignore
     nc_scores = 1 - ana_data.niche_cluster_score if ana_data.options.reverse else ana_data.niche_cluster_score
-    niche_cluster_colors = [sm.to_rgba(nc_scores[n]) for n in np.arange(ana_data.niche_cluster_score.shape[0])]
+    niche_cluster_colors = sm.to_rgba(nc_scores)  # one RGBA row for each niche cluster
 
     # loadings
     niche_cluster_loading = ana_data.niche_level_niche_cluster_assign.sum(axis=0)
@@ -100,6 +102,7 @@ def plot_cluster_proportion(ana_data: AnaData) -> Optional[Tuple[plt.Figure, plt
     fig.tight_layout()
     if ana_data.options.output is not None:
         fig.savefig(f'{ana_data.options.output}/niche_cluster_proportion.pdf')
+        plt.close(fig)
         return None
     else:
         return fig, ax
@@ -123,26 +126,34 @@ def plot_niche_cluster_loadings_dataset(ana_data: AnaData) -> Optional[Tuple[plt
     nc_scores = 1 - ana_data.niche_cluster_score if ana_data.options.reverse else ana_data.niche_cluster_score
     samples: List[str] = ana_data.cell_type_composition['sample'].unique().tolist()
     M, N = len(samples), ana_data.cell_level_niche_cluster_assign.shape[1]
+    # join coordinates and split cells by sample once
+    data_df = ana_data.cell_level_niche_cluster_assign.join(ana_data.cell_type_composition[['x', 'y']])
+    sample_groups = ana_data.cell_type_composition.groupby('sample', sort=False).groups
+    nc_order = nc_scores.argsort()
 
     fig, axes = plt.subplots(M, N, figsize=(3.3 * N, 3 * M))
     for i, sample in enumerate(samples):
-        sample_df = ana_data.cell_level_niche_cluster_assign.loc[ana_data.cell_type_composition[
-            ana_data.cell_type_composition['sample'] == sample].index]
-        sample_df = sample_df.join(ana_data.cell_type_composition[['x', 'y']])
-        for j, c_index in enumerate(nc_scores.argsort()):
+        sample_df = data_df.loc[sample_groups[sample]]
+        # extract arrays once per sample instead of looking up columns for each panel
+        x, y = sample_df['x'].to_numpy(), sample_df['y'].to_numpy()
+        loadings = sample_df[[f'NicheCluster_{k}' for k in range(N)]].to_numpy()
+        for j, c_index in enumerate(nc_order):
             ax = axes[i, j] if M > 1 else axes[j]
-            scatter = ax.scatter(sample_df['x'],
-                                 sample_df['y'],
-                                 c=sample_df[f'NicheCluster_{c_index}'],
-                                 cmap='Reds',
-                                 vmin=0,
-                                 vmax=1,
-                                 s=4)
+            ax.scatter(x,
+                       y,
+                       c=loadings[:, c_index],
+                       cmap='Reds',
+                       vmin=0,
+                       vmax=1,
+                       s=4,
+                       rasterized=True)
             ax.set_title(f'{sample}: niche cluster {c_index}')
-            plt.colorbar(scatter)
     fig.tight_layout()
+    # all panels share the same color scale, draw one colorbar for the whole figure
+    fig.colorbar(ScalarMappable(norm=Normalize(vmin=0, vmax=1), cmap='Reds'), ax=axes, fraction=0.02, pad=0.01)
     if ana_data.options.output is not None:
-        fig.savefig(f'{ana_data.options.output}/niche_cluster_loadings.pdf')
+        fig.savefig(f'{ana_data.options.output}/niche_cluster_loadings.pdf', dpi=RASTER_DPI)
+        plt.close(fig)
         return None
     else:
         return fig, ax
@@ -165,28 +176,35 @@ def plot_niche_cluster_loadings_sample(ana_data: AnaData) -> Optional[List[Tuple
 
     nc_scores = 1 - ana_data.niche_cluster_score if ana_data.options.reverse else ana_data.niche_cluster_score
     samples: List[str] = ana_data.cell_type_composition['sample'].unique().tolist()
+    # join coordinates and split cells by sample once
+    data_df = ana_data.cell_level_niche_cluster_assign.join(ana_data.cell_type_composition[['x', 'y']])
+    sample_groups = ana_data.cell_type_composition.groupby('sample', sort=False).groups
+    nc_order = nc_scores.argsort()
 
     output = []
     for sample in samples:
-        sample_df = ana_data.cell_level_niche_cluster_assign.loc[ana_data.cell_type_composition[
-            ana_data.cell_type_composition['sample'] == sample].index]
-        sample_df = sample_df.join(ana_data.cell_type_composition[['x', 'y']])
+        sample_df = data_df.loc[sample_groups[sample]]
+        # extract arrays once per sample instead of looking up columns for each panel
+        x, y = sample_df['x'].to_numpy(), sample_df['y'].to_numpy()
+        loadings = sample_df[[f'NicheCluster_{k}' for k in range(nc_scores.shape[0])]].to_numpy()
         fig, axes = plt.subplots(1, nc_scores.shape[0], figsize=(3.3 * nc_scores.shape[0], 3))
-        for j, c_index in enumerate(nc_scores.argsort()):
+        for j, c_index in enumerate(nc_order):
             ax = axes[j]  #  there should more than one niche cluster
-            scatter = ax.scatter(sample_df['x'],
-                                 sample_df['y'],
-                                 c=sample_df[f'NicheCluster_{c_index}'],
-                                 cmap='Reds',
-                                 vmin=0,
-                                 vmax=1,
-                                 s=4)
+            ax.scatter(x,
+                       y,
+                       c=loadings[:, c_index],
+                       cmap='Reds',
+                       vmin=0,
+                       vmax=1,
+                       s=4,
+                       rasterized=True)
             ax.set_title(f'{sample}: niche cluster {c_index}')
-            plt.colorbar(scatter)
         fig.tight_layout()
+        # all panels share the same color scale, draw one colorbar for the whole figure
+        fig.colorbar(ScalarMappable(norm=Normalize(vmin=0, vmax=1), cmap='Reds'), ax=axes, fraction=0.02, pad=0.01)
         output.append((fig, axes))
         if ana_data.options.output is not None:
-            fig.savefig(f'{ana_data.options.output}/niche_cluster_loadings_{sample}.pdf')
+            fig.savefig(f'{ana_data.options.output}/niche_cluster_loadings_{sample}.pdf', dpi=RASTER_DPI)
     return output if len(output) > 0 else None
 
 
@@ -222,31 +240,35 @@ def plot_max_niche_cluster_dataset(ana_data: AnaData) -> Optional[Tuple[plt.Figu
     norm = Normalize(vmin=0, vmax=1)
     sm = ScalarMappable(cmap=plt.cm.rainbow, norm=norm)  # type: ignore
     nc_scores = 1 - ana_data.niche_cluster_score if ana_data.options.reverse else ana_data.niche_cluster_score
-    niche_cluster_colors = [sm.to_rgba(nc_scores[n]) for n in np.arange(ana_data.niche_cluster_score.shape[0])]
-    palette = {f'niche cluster {i}': niche_cluster_colors[i] for i in range(ana_data.niche_cluster_score.shape[0])}
+    niche_cluster_colors = sm.to_rgba(nc_scores)  # one RGBA row for each niche cluster
+    palette = {f'niche cluster {i}': tuple(color) for i, color in enumerate(niche_cluster_colors)}
     samples: List[str] = ana_data.cell_type_composition['sample'].unique().tolist()
     M = len(samples)
+    # join coordinates and split cells by sample once
+    data_df = ana_data.cell_level_max_niche_cluster.join(ana_data.cell_type_composition[['x', 'y']])
+    sample_groups = ana_data.cell_type_composition.groupby('sample', sort=False).groups
+    hue_order = [f'niche cluster {j}' for j in nc_scores.argsort()]
 
     fig, axes = plt.subplots(1, M, figsize=(5 * M, 3))
     for i, sample in enumerate(samples):
         ax = axes[i] if M > 1 else axes
-        sample_df = ana_data.cell_level_max_niche_cluster.loc[ana_data.cell_type_composition[
-            ana_data.cell_type_composition['sample'] == sample].index]
-        sample_df = sample_df.join(ana_data.cell_type_composition[['x', 'y']])
+        sample_df = data_df.loc[sample_groups[sample]]
         sample_df['Niche_Cluster'] = 'niche cluster ' + sample_df['Niche_Cluster'].astype(str)
         sns.scatterplot(data=sample_df,
                         x='x',
                         y='y',
                         hue='Niche_Cluster',
-                        hue_order=[f'niche cluster {j}' for j in nc_scores.argsort()],
+                        hue_order=hue_order,
                         palette=palette,
                         s=10,
+                        rasterized=True,
                         ax=ax)
         ax.set_title(f'{sample}')
         ax.legend(loc='upper left', bbox_to_anchor=(1, 1))
     fig.tight_layout()
     if ana_data.options.output is not None:
-        fig.savefig(f'{ana_data.options.output}/max_niche_cluster.pdf')
+        fig.savefig(f'{ana_data.options.output}/max_niche_cluster.pdf', dpi=RASTER_DPI)
+        plt.close(fig)
         return None
     else:
         return fig, axes
@@ -271,31 +293,34 @@ def plot_max_niche_cluster_sample(ana_data: AnaData) -> Optional[List[Tuple[plt.
     norm = Normalize(vmin=0, vmax=1)
     sm = ScalarMappable(cmap=plt.cm.rainbow, norm=norm)  # type: ignore
     nc_scores = 1 - ana_data.niche_cluster_score if ana_data.options.reverse else ana_data.niche_cluster_score
-    niche_cluster_colors = [sm.to_rgba(nc_scores[n]) for n in np.arange(ana_data.niche_cluster_score.shape[0])]
-    palette = {f'niche cluster {i}': niche_cluster_colors[i] for i in range(ana_data.niche_cluster_score.shape[0])}
+    niche_cluster_colors = sm.to_rgba(nc_scores)  # one RGBA row for each niche cluster
+    palette = {f'niche cluster {i}': tuple(color) for i, color in enumerate(niche_cluster_colors)}
     samples: List[str] = ana_data.cell_type_composition['sample'].unique().tolist()
+    # join coordinates and split cells by sample once
+    data_df = ana_data.cell_level_max_niche_cluster.join(ana_data.cell_type_composition[['x', 'y']])
+    sample_groups = ana_data.cell_type_composition.groupby('sample', sort=False).groups
+    hue_order = [f'niche cluster {j}' for j in nc_scores.argsort()]
 
     output = []
     for sample in samples:
-        sample_df = ana_data.cell_level_max_niche_cluster.loc[ana_data.cell_type_composition[
-            ana_data.cell_type_composition['sample'] == sample].index]
-        sample_df = sample_df.join(ana_data.cell_type_composition[['x', 'y']])
+        sample_df = data_df.loc[sample_groups[sample]]
         sample_df['Niche_Cluster'] = 'niche cluster ' + sample_df['Niche_Cluster'].astype(str)
         fig, ax = plt.subplots(1, 1, figsize=(5, 3))
         sns.scatterplot(data=sample_df,
                         x='x',
                         y='y',
                         hue='Niche_Cluster',
-                        hue_order=[f'niche cluster {j}' for j in nc_scores.argsort()],
+                        hue_order=hue_order,
                         palette=palette,
                         s=10,
+                        rasterized=True,
                         ax=ax)
         ax.set_title(f'{sample}')
         ax.legend(loc='upper left', bbox_to_anchor=(1, 1))
         fig.tight_layout()
         output.append((fig, ax))
         if ana_data.options.output is not None:
-            fig.savefig(f'{ana_data.options.output}/max_niche_cluster_{sample}.pdf')
+            fig.savefig(f'{ana_data.options.output}/max_niche_cluster_{sample}.pdf', dpi=RASTER_DPI)
     return output if len(output) > 0 else None
 
 
@@ -325,7 +350,7 @@ def plot_niche_cluster_gini(ana_data: AnaData) -> Optional[Tuple[plt.Figure, plt
     except FileNotFoundError as e:
         warning(str(e))
         return None
-    intra_cluster_gini = ana_data.cell_level_niche_cluster_assign.apply(gini, axis=0).values
+    intra_cluster_gini = gini_along_axis(ana_data.cell_level_niche_cluster_assign.values, axis=0)
     intra_cluster_gini_df = pd.DataFrame(data={
         'gini': intra_cluster_gini,
         'cluster': ana_data.cell_level_niche_cluster_assign.columns
@@ -338,6 +363,7 @@ def plot_niche_cluster_gini(ana_data: AnaData) -> Optional[Tuple[plt.Figure, plt
     fig.tight_layout()
     if ana_data.options.output is not None:
         fig.savefig(f'{ana_data.options.output}/niche_cluster_gini.pdf')
+        plt.close(fig)
         return None
     else:
         return fig, ax
@@ -358,10 +384,10 @@ def niche_cluster_visualization(ana_data: AnaData) -> None:
     # 3. niche cluster loadings for each cell
     if not hasattr(ana_data.options,
                    'suppress_niche_cluster_loadings') or not ana_data.options.suppress_niche_cluster_loadings:
-        plot_niche_cluster_loadings(ana_data=ana_data)
+        close_sample_figures(ana_data=ana_data, figures=plot_niche_cluster_loadings(ana_data=ana_data))
 
     # 4. maximum niche cluster for each cell
-    plot_max_niche_cluster(ana_data=ana_data)
+    close_sample_figures(ana_data=ana_data, figures=plot_max_niche_cluster(ana_data=ana_data))
 
     # 5. gini coefficient of each niche cluster
     plot_niche_cluster_gini(ana_data=ana_data)
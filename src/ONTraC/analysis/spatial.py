@@ -2,13 +2,14 @@ from typing import List, Optional, Tuple, Union
 
 import matplotlib as mpl
 
-mpl.rcParams['pdf.fonttype'] = 42
-mpl.rcParams['ps.fonttype'] = 42
-mpl.rcParams['font.family'] = 'Arial'
+from .constants import MPL_RC_PARAMS
+
+mpl.rcParams.update(MPL_RC_PARAMS)
 import matplotlib.pyplot as plt
 
 from ..log import warning
 from .data import AnaData
+from .utils import close_sample_figures
 
 
 def plot_cell_type_composition_dataset(ana_data: AnaData) -> Optional[Tuple[plt.Figure, plt.Axes]]:
@@ -50,6 +51,7 @@ def plot_cell_type_composition_dataset(ana_data: AnaData) -> Optional[Tuple[plt.
     fig.tight_layout()
     if ana_data.options.output is not None:
         fig.savefig(f'{ana_data.options.output}/cell_type_compostion.pdf', transparent=True)
+        plt.close(fig)
         return None
     else:
         return fig, axes
@@ -92,11 +94,9 @@ def plot_cell_type_composition_sample(ana_data: AnaData) -> Optional[List[Tuple[
             plt.colorbar(scatter)
             ax.set_title(f"{sample} {cell_type}")
         fig.tight_layout()
+        output.append((fig, axes))
         if ana_data.options.output is not None:
             fig.savefig(f'{ana_data.options.output}/{sample}_cell_type_compostion.pdf', transparent=True)
-            plt.close(fig)
-        else:
-            output.append((fig, axes))
 
     return output if len(output) > 0 else None
 
@@ -122,8 +122,6 @@ def plot_niche_NT_score_dataset(ana_data: AnaData) -> Optional[Tuple[plt.Figure,
     :return: None or Tuple[plt.Figure, plt.Axes]
     """
 
-    samples: List[str] = ana_data.NT_score['sample'].unique().tolist()
-
     try:
         if 'Niche_NTScore' not in ana_data.NT_score.columns:
             warning("Niche_NTScore not found in the NT score data.")
@@ -132,6 +130,8 @@ def plot_niche_NT_score_dataset(ana_data: AnaData) -> Optional[Tuple[plt.Figure,
         warning(str(e))
         return None
 
+    samples: List[str] = ana_data.NT_score['sample'].unique().tolist()
+
     N = len(samples)
     fig, axes = plt.subplots(1, N, figsize=(3.5 * N, 3))
     for i, sample in enumerate(samples):
@@ -147,6 +147,7 @@ def plot_niche_NT_score_dataset(ana_data: AnaData) -> Optional[Tuple[plt.Figure,
     fig.tight_layout()
     if ana_data.options.output is not None:
         fig.savefig(f'{ana_data.options.output}/niche_NT_score.pdf', transparent=True)
+        plt.close(fig)
         return None
     else:
         return fig, axes
@@ -160,8 +161,6 @@ def plot_niche_NT_score_sample(ana_data: AnaData) -> Optional[List[Tuple[plt.Fig
     :return: None or Tuple[plt.Figure, plt.Axes]
     """
 
-    samples: List[str] = ana_data.NT_score['sample'].unique().tolist()
-
     try:
         if 'Niche_NTScore' not in ana_data.NT_score.columns:
             warning("Niche_NTScore not found in the NT score data.")
@@ -170,6 +169,8 @@ def plot_niche_NT_score_sample(ana_data: AnaData) -> Optional[List[Tuple[plt.Fig
         warning(str(e))
         return None
 
+    samples: List[str] = ana_data.NT_score['sample'].unique().tolist()
+
     output = []
     for sample in samples:
         fig, ax = plt.subplots(1, 1, figsize=(3.5, 3))
@@ -181,11 +182,9 @@ def plot_niche_NT_score_sample(ana_data: AnaData) -> Optional[List[Tuple[plt.Fig
         plt.colorbar(scatter)
         ax.set_title(f"{sample} Niche-level NT Score")
         fig.tight_layout()
+        output.append((fig, ax))
         if ana_data.options.output is not None:
             fig.savefig(f'{ana_data.options.output}/{sample}_niche_NT_score.pdf', transparent=True)
-            plt.close(fig)
-        else:
-            output.append((fig, ax))
 
     return output if len(output) > 0 else None
 
@@ -211,8 +210,6 @@ def plot_cell_NT_score_dataset(ana_data: AnaData) -> Optional[Tuple[plt.Figure,
     :return: None or Tuple[plt.Figure, plt.Axes]
     """
 
-    samples: List[str] = ana_data.NT_score['sample'].unique().tolist()
-
     try:
         if 'Cell_NTScore' not in ana_data.NT_score.columns:
             warning("Cell_NTScore not found in the NT score data.")
@@ -221,6 +218,8 @@ def plot_cell_NT_score_dataset(ana_data: AnaData) -> Optional[Tuple[plt.Figure,
         warning(str(e))
         return None
 
+    samples: List[str] = ana_data.NT_score['sample'].unique().tolist()
+
     N = len(samples)
     fig, axes = plt.subplots(1, N, figsize=(3.5 * N, 3))
     for i, sample in enumerate(samples):
@@ -236,6 +235,7 @@ def plot_cell_NT_score_dataset(ana_data: AnaData) -> Optional[Tuple[plt.Figure,
     fig.tight_layout()
     if ana_data.options.output is not None:
         fig.savefig(f'{ana_data.options.output}/cell_NT_score.pdf', transparent=True)
+        plt.close(fig)
         return None
     else:
         return fig, axes
@@ -249,8 +249,6 @@ def plot_cell_NT_score_sample(ana_data: AnaData) -> Optional[List[Tuple[plt.Figu
     :return: None or Tuple[plt.Figure, plt.Axes]
     """
 
-    samples: List[str] = ana_data.NT_score['sample'].unique().tolist()
-
     try:
         if 'Cell_NTScore' not in ana_data.NT_score.columns:
             warning("Cell_NTScore not found in the NT score data.")
@@ -259,6 +257,8 @@ def plot_cell_NT_score_sample(ana_data: AnaData) -> Optional[List[Tuple[plt.Figu
         warning(str(e))
         return None
 
+    samples: List[str] = ana_data.NT_score['sample'].unique().tolist()
+
     output = []
     for sample in samples:
         fig, ax = plt.subplots(1, 1, figsize=(3.5, 3))
@@ -270,11 +270,9 @@ def plot_cell_NT_score_sample(ana_data: AnaData) -> Optional[List[Tuple[plt.Figu
         plt.colorbar(scatter)
         ax.set_title(f"{sample} Cell-level NT Score")
         fig.tight_layout()
+        output.append((fig, ax))
         if ana_data.options.output is not None:
             fig.savefig(f'{ana_data.options.output}/{sample}_cell_NT_score.pdf', transparent=True)
-            plt.close(fig)
-        else:
-            output.append((fig, ax))
 
     return output if len(output) > 0 else None
 
@@ -301,9 +299,9 @@ def spatial_visualization(ana_data: AnaData) -> None:
     # 1. cell type compostion
     if not hasattr(ana_data.options,
                    'suppress_cell_type_composition') or not ana_data.options.suppress_cell_type_composition:
-        plot_cell_type_composition(ana_data=ana_data)
+        close_sample_figures(ana_data=ana_data, figures=plot_cell_type_composition(ana_data=ana_data))
 
     # 2. NT score
     if not hasattr(ana_data.options, 'suppress_niche_trajectory') or not ana_data.options.suppress_niche_trajectory:
-        plot_niche_NT_score(ana_data=ana_data)
-        plot_cell_NT_score(ana_data=ana_data)
+        close_sample_figures(ana_data=ana_data, figures=plot_niche_NT_score(ana_data=ana_data))
+        close_sample_figures(ana_data=ana_data, figures=plot_cell_NT_score(ana_data=ana_data))
@@ -2,9 +2,9 @@ from typing import Optional, Tuple
 
 import matplotlib as mpl
 
-mpl.rcParams['pdf.fonttype'] = 42
-mpl.rcParams['ps.fonttype'] = 42
-mpl.rcParams['font.family'] = 'Arial'
+from .constants import MPL_RC_PARAMS
+
+mpl.rcParams.update(MPL_RC_PARAMS)
 import matplotlib.pyplot as plt
 import seaborn as sns
 
@@ -1,26 +1,53 @@
+from typing import List, Optional, Tuple
+
 import numpy as np
 import pandas as pd
+from matplotlib.axes import Axes
+from matplotlib.figure import Figure
+
+from .data import AnaData
 
 
 def gini(array: np.ndarray | pd.Series) -> float:
     """Calculate the Gini coefficient of a numpy array."""
+    # All values are treated equally, arrays must be 1d:
+    return float(gini_along_axis(np.ravel(array), axis=0))
+
+
+def gini_along_axis(array: np.ndarray | pd.DataFrame, axis: int = 0) -> np.ndarray:
+    """Calculate the Gini coefficient along the given axis of a 2D array."""
     #
     # from:
     # http://www.statsdirect.com/help/default.htm#nonparametric_methods/gini.htm
-    # All values are treated equally, arrays must be 1d:
-    if isinstance(array, pd.Series):
-        array = np.array(array)
-    array = array.flatten()  # type: ignore
-    if np.amin(array) < 0:
-        # Values cannot be negative:
-        array -= np.amin(array)  # type: ignore
+    # one coefficient per column (axis=0) or row (axis=1)
+    array = np.asarray(array, dtype=np.float64)
+    # Values cannot be negative:
+    array = array - np.minimum(np.amin(array, axis=axis, keepdims=True), 0)
     # Values cannot be 0:
     array += 0.0000001
     # Values must be sorted:
-    array = np.sort(array)  # type: ignore
+    array = np.sort(array, axis=axis)
     # Number of array elements:
-    n = array.shape[0]  # type: ignore
+    n = array.shape[axis]
     # Index per array element:
-    index = np.arange(1, n + 1)  # type: ignore
+    index = np.arange(1, n + 1).reshape([-1 if i == axis else 1 for i in range(array.ndim)])
     # Gini coefficient:
-    return ((np.sum((2 * index - n - 1) * array)) / (n * np.sum(array)))  # type: ignore
+    return np.sum((2 * index - n - 1) * array, axis=axis) / (n * np.sum(array, axis=axis))
+
+
+def close_sample_figures(ana_data: AnaData, figures: Optional[List[Tuple[Figure, Axes]]]) -> None:
+    """
+    Close the saved figures returned by the per-sample plotting functions.
+    :param ana_data: AnaData, the data for analysis.
+    :param figures: None or List[Tuple[plt.Figure, plt.Axes]], the returned figures.
+    :return: None
+    """
+
+    # pyplot is imported here so that importing this module does not select a backend
+    import matplotlib.pyplot as plt
+
+    # figures are only kept open for the caller when nothing is saved
+    if ana_data.options.output is None or not isinstance(figures, list):
+        return
+    for fig, _ in figures:
+        plt.close(fig)
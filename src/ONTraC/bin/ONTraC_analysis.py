@@ -1,14 +1,11 @@
 import os
 import sys
-from optparse import OptionGroup, OptionParser, Values
+from argparse import ArgumentParser, Namespace
+from functools import lru_cache
 
-from ..analysis.cell_type import cell_type_visualization
 from ..analysis.data import AnaData
-from ..analysis.niche_cluster import niche_cluster_visualization
-from ..analysis.spatial import spatial_visualization
-from ..analysis.train_loss import train_loss_visualiztion
 from ..log import *
-from ..optparser._IO import add_IO_options_group, validate_io_options, write_io_options_memo
+from ..optparser._IO import add_IO_options_group, io_options_memo, validate_io_options, validate_output_dir
 from ..utils import *
 from ..version import __version__
 
@@ -21,7 +18,16 @@ IO_OPTIONS = ['dataset', 'preprocessing_dir', 'GNN_dir', 'NTScore_dir']
 # ------------------------------------
 # Functions
 # ------------------------------------
-def analysis_pipeline(options: Values) -> None:
+def analysis_pipeline(options: Namespace) -> None:
+    # plotting modules import matplotlib and seaborn, only load them when plotting
+    # figures are only written to files here, use the non-interactive backend
+    import matplotlib as mpl
+    mpl.use('Agg')
+    from ..analysis.cell_type import cell_type_visualization
+    from ..analysis.niche_cluster import niche_cluster_visualization
+    from ..analysis.spatial import spatial_visualization
+    from ..analysis.train_loss import train_loss_visualiztion
+
     # 0. load data class
     ana_data = AnaData(options)
 
@@ -39,75 +45,69 @@ def analysis_pipeline(options: Values) -> None:
 
 
 # TODO: move to optparser
-def add_suppress_group(optparser: OptionParser) -> None:
-    group = OptionGroup(optparser, 'Suppress options')
-    group.add_option('--suppress-cell-type-composition',
-                     dest='suppress_cell_type_composition',
-                     action='store_true',
-                     default=False,
-                     help='Suppress the cell type composition visualization.')
-    group.add_option('--suppress-niche-cluster-loadings',
-                     dest='suppress_niche_cluster_loadings',
-                     action='store_true',
-                     default=False,
-                     help='Suppress the niche cluster loadings visualization.')
-    group.add_option('--suppress-niche-trajectory',
-                        dest='suppress_niche_trajectory',
-                        action='store_true',
-                        default=False,
-                        help='Suppress the niche trajectory related visualization.')
-    optparser.add_option_group(group)
-
-
-def prepare_optparser() -> OptionParser:
+def add_suppress_group(optparser: ArgumentParser) -> None:
+    group = optparser.add_argument_group('Suppress options')
+    group.add_argument('--suppress-cell-type-composition',
+                       dest='suppress_cell_type_composition',
+                       action='store_true',
+                       default=False,
+                       help='Suppress the cell type composition visualization.')
+    group.add_argument('--suppress-niche-cluster-loadings',
+                       dest='suppress_niche_cluster_loadings',
+                       action='store_true',
+                       default=False,
+                       help='Suppress the niche cluster loadings visualization.')
+    group.add_argument('--suppress-niche-trajectory',
+                       dest='suppress_niche_trajectory',
+                       action='store_true',
+                       default=False,
+                       help='Suppress the niche trajectory related visualization.')
+
+
+@lru_cache(maxsize=None)
+def prepare_optparser() -> ArgumentParser:
     """Prepare optparser object. New options will be added in this function first.
 
-    Ret: OptParser object.
+    Ret: ArgumentParser object.
     """
-    usage = "USAGE: %prog <-d DATASET> <--preprocessing-dir PREPROCESSING_DIR> <--GNN-dir GNN_DIR> <--NTScore-dir NTSCORE_DIR> <-o OUTPUT_DIR> [-l LOG_FILE] [-r REVERSE]"
+    usage = "%(prog)s <-d DATASET> <--preprocessing-dir PREPROCESSING_DIR> <--GNN-dir GNN_DIR> <--NTScore-dir NTSCORE_DIR> <-o OUTPUT_DIR> [-l LOG_FILE] [-r REVERSE]"
     description = "Analysis the results of ONTraC."
-    optparser = OptionParser(version=f'%prog {__version__}',
-                             usage=usage,
-                             description=description,
-                             add_help_option=False)
-    optparser.add_option('-h', '--help', action='help', help='Show this help message and exit.')
-    optparser.add_option('-o', '--output', dest='output', type='string', help='Output directory.')
-    optparser.add_option('-l', '--log', dest='log', type='string', help='Log file.')
-    optparser.add_option('-r',
-                         '--reverse',
-                         dest='reverse',
-                         action='store_true',
-                         default=False,
-                         help='Reverse the NT score.')
-    optparser.add_option('-s',
-                         '--sample',
-                         dest='sample',
-                         action='store_true',
-                         default=False,
-                         help='Plot each sample separately.')
+    optparser = ArgumentParser(usage=usage, description=description, add_help=False)
+    optparser.add_argument('-h', '--help', action='help', help='Show this help message and exit.')
+    optparser.add_argument('--version', action='version', version=f'%(prog)s {__version__}')
+    optparser.add_argument('-o', '--output', dest='output', type=str, help='Output directory.')
+    optparser.add_argument('-l', '--log', dest='log', type=str, help='Log file.')
+    optparser.add_argument('-r',
+                           '--reverse',
+                           dest='reverse',
+                           action='store_true',
+                           default=False,
+                           help='Reverse the NT score.')
+    optparser.add_argument('-s',
+                           '--sample',
+                           dest='sample',
+                           action='store_true',
+                           default=False,
+                           help='Plot each sample separately.')
     add_IO_options_group(optparser=optparser, io_options=IO_OPTIONS)
     add_suppress_group(optparser)
     return optparser
 
 
-def opt_validate(optparser: OptionParser) -> Values:
-    """Validate options from a OptParser object.
+def opt_validate(optparser: ArgumentParser) -> Namespace:
+    """Validate options from a ArgumentParser object.
 
     Args:
-        optparser: OptParser object.
+        optparser: ArgumentParser object.
     """
-    (options, args) = optparser.parse_args()
+    options = optparser.parse_args()
 
     validate_io_options(optparser, options, IO_OPTIONS, overwrite_validation=False)
 
     if not options.output:
         error('Output directory is required.')
         sys.exit(1)
-    if not os.path.isdir(options.output):
-        info(f'Output directory not found: {options.output}, will create it.')
-        os.makedirs(options.output)
-    else:
-        warning(f'Output directory already exists: {options.output}, will overwrite it.')
+    validate_output_dir(optparser, options.output)
 
     if not os.path.exists(options.log):
         error(f'Log file not found: {options.log}')
@@ -119,19 +119,22 @@ def opt_validate(optparser: OptionParser) -> Values:
         sys.exit(1)
     options.device = 'cpu'
 
-    info('------------------ RUN params memo ------------------ ')
     # print parameters to stdout
-    write_io_options_memo(options, IO_OPTIONS)
-    info(f'Output directory: {options.output}')
-    info(f'Log file: {options.log}')
-    info(f'Reverse: {options.reverse}')
-    info(f'Sample: {options.sample}')
+    memo = [
+        '------------------ RUN params memo ------------------ ',
+        *io_options_memo(options, IO_OPTIONS),
+        f'Output directory: {options.output}',
+        f'Log file: {options.log}',
+        f'Reverse: {options.reverse}',
+        f'Sample: {options.sample}',
+    ]
     if hasattr(options, 'suppress_cell_type_composition'):
-        info(f'Suppress cell type composition: {options.suppress_cell_type_composition}')
+        memo.append(f'Suppress cell type composition: {options.suppress_cell_type_composition}')
     if hasattr(options, 'suppress_niche_cluster_loadings'):
-        info(f'Suppress niche cluster loadings: {options.suppress_niche_cluster_loadings}')
+        memo.append(f'Suppress niche cluster loadings: {options.suppress_niche_cluster_loadings}')
     if hasattr(options, 'suppress_niche_trajectory'):
-        info(f'Suppress niche trajectory: {options.suppress_niche_trajectory}')
+        memo.append(f'Suppress niche trajectory: {options.suppress_niche_trajectory}')
+    info_block(memo)
 
     return options
 
@@ -1,4 +1,8 @@
-from optparse import Values
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from argparse import Namespace
 from typing import Dict, List
 
 import numpy as np
@@ -8,7 +12,7 @@ import torch_geometric.transforms as T
 from torch_geometric.data import Data, InMemoryDataset
 
 from .log import *
-from .utils import count_lines, get_rel_params, read_yaml_file
+from .utils import count_lines, get_rel_params, read_csv_array, read_yaml_file
 
 
 # ------------------------------------
@@ -16,9 +20,12 @@ from .utils import count_lines, get_rel_params, read_yaml_file
 # ------------------------------------
 class SpatailOmicsDataset(InMemoryDataset):
 
-    def __init__(self, root, params: Dict, transform=None, pre_transform=None):
+    def __init__(self, root, params: Dict, transform=None, pre_transform=None, n_workers: int = 1):
         self.params = params
-        super(SpatailOmicsDataset, self).__init__(root, transform, pre_transform)
+        self.n_workers = n_workers
+        # samples may change between runs in the same directory, always rebuild the processed file
+        super(SpatailOmicsDataset, self).__init__(root, transform, pre_transform, force_reload=True)
+        self.load(self.processed_paths[0])
 
     @property
     def raw_file_names(self):  # required by InMemoryDataset
@@ -34,23 +41,111 @@ class SpatailOmicsDataset(InMemoryDataset):
         pass
 
     def process(self):
+        samples = self.params['Data']
+        n_workers = min(len(samples), self.n_workers)
+        # the .npy caches live in the processed directory, the input directory is never written to
+        load_arrays = partial(load_sample_arrays, cache_dir=self.processed_dir)
+        if n_workers > 1 and not all(is_sample_cached(sample, self.processed_dir) for sample in samples):
+            # samples are independent, parse them in parallel when their CSV files have to be read
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                sample_arrays = list(executor.map(load_arrays, samples))
+        else:
+            sample_arrays = list(map(load_arrays, samples))
         data_list = []
-        for index, sample in enumerate(self.params['Data']):
-            info(f'Processing sample {index + 1} of {len(self.params["Data"])}: {sample["Name"]}')
-            data = Data(
-                x=torch.from_numpy(np.loadtxt(sample['Features'], dtype=np.float32, delimiter=',')),
-                edge_index=torch.from_numpy(np.loadtxt(sample['EdgeIndex'], dtype=np.int64,
-                                                       delimiter=',')).t().contiguous(),
-                # TODO: support 3D coordinates
-                pos=torch.from_numpy(pd.read_csv(sample['Coordinates'])[['x', 'y']].values),
-                name=sample['Name'])
+        for index, (sample, arrays) in enumerate(zip(samples, sample_arrays)):
+            info(f'Processing sample {index + 1} of {len(samples)}: {sample["Name"]}')
+            data = Data(x=torch.from_numpy(np.ascontiguousarray(arrays['x'])),
+                        edge_index=torch.from_numpy(arrays['edge_index']).t().contiguous(),
+                        pos=torch.from_numpy(arrays['pos']),
+                        name=sample['Name'])
+            if self.pre_transform is not None:
+                data = self.pre_transform(data)
             data_list.append(data)
-        self.data, self.slices = self.collate(data_list)
+        self.save(data_list, self.processed_paths[0])
 
 
 # ------------------------------------
 # Misc functions
 # ------------------------------------
+def csv_array_cache_file(filename: str, dtype: type, cache_dir: str) -> str:
+    """
+    Get the .npy cache file name of a CSV file
+    :param filename: str, CSV file name
+    :param dtype: type, data type of the array
+    :param cache_dir: str, directory of the cache files
+    :return: str, cache file name
+    """
+    return os.path.join(cache_dir, f'{os.path.basename(filename)}.{np.dtype(dtype).name}.npy')
+
+
+def is_csv_array_cached(filename: str, dtype: type, cache_dir: str) -> bool:
+    """
+    Check whether the .npy cache of a CSV file exists and is newer than the CSV file
+    :param filename: str, CSV file name
+    :param dtype: type, data type of the array
+    :param cache_dir: str, directory of the cache files
+    :return: bool
+    """
+    cache_file = csv_array_cache_file(filename, dtype, cache_dir)
+    return os.path.isfile(cache_file) and os.stat(cache_file).st_mtime_ns > os.stat(filename).st_mtime_ns
+
+
+def cached_read_csv_array(filename: str, dtype: type, cache_dir: str) -> np.ndarray:
+    """
+    Read a CSV file into numpy array, reuse its .npy cache in cache_dir if it is newer than the CSV file
+    :param filename: str, CSV file name
+    :param dtype: type, data type of the array
+    :param cache_dir: str, directory of the cache files
+    :return: np.ndarray
+    """
+    cache_file = csv_array_cache_file(filename, dtype, cache_dir)
+    if is_csv_array_cached(filename, dtype, cache_dir):
+        try:
+            return np.load(cache_file)
+        except (ValueError, OSError, EOFError) as e:
+            warning(f'Ignoring unreadable cache {cache_file}: {e}')
+    array = read_csv_array(filename, dtype=dtype)
+    # write to a temporary file and move it into place, so an interrupted write never leaves a truncated cache
+    tmp_file = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.npy', delete=False) as fhd:
+            tmp_file = fhd.name
+            np.save(fhd, array)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        warning(f'Failed to cache {filename}: {e}')
+        if tmp_file is not None and os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return array
+
+
+def is_sample_cached(sample: Dict[str, str], cache_dir: str) -> bool:
+    """
+    Check whether the arrays of a sample can be loaded from their .npy caches
+    :param sample: Dict[str, str], sample information
+    :param cache_dir: str, directory of the cache files
+    :return: bool
+    """
+    return is_csv_array_cached(sample['Features'], np.float32, cache_dir) and is_csv_array_cached(
+        sample['EdgeIndex'], np.int64, cache_dir)
+
+
+def load_sample_arrays(sample: Dict[str, str], cache_dir: str) -> Dict[str, np.ndarray]:
+    """
+    Load the arrays of a sample
+    :param sample: Dict[str, str], sample information
+    :param cache_dir: str, directory of the cache files
+    :return: Dict[str, np.ndarray], features, edge index and coordinates
+    """
+    return {
+        'x': cached_read_csv_array(sample['Features'], dtype=np.float32, cache_dir=cache_dir),
+        'edge_index': cached_read_csv_array(sample['EdgeIndex'], dtype=np.int64, cache_dir=cache_dir),
+        # TODO: support 3D coordinates
+        'pos': pd.read_csv(sample['Coordinates'], usecols=['x', 'y'], dtype=np.float32)[['x', 'y']].values,
+    }
+
+
 def max_nodes(samples: List[Dict[str, str]]) -> int:
     """
     Get the maximum number of nodes in a dataset
@@ -63,10 +158,10 @@ def max_nodes(samples: List[Dict[str, str]]) -> int:
     return max_nodes
 
 
-def load_dataset(options: Values) -> SpatailOmicsDataset:
+def load_dataset(options: Namespace) -> SpatailOmicsDataset:
     """
     Load dataset
-    :param options: Values, input options
+    :param options: Namespace, input options
     :return: SpatailOmicsDataset, torch dataset
     """
     params = read_yaml_file(f'{options.preprocessing_dir}/samples.yaml')
@@ -78,7 +173,7 @@ def load_dataset(options: Values) -> SpatailOmicsDataset:
 # ------------------------------------
 # Flow control functions
 # ------------------------------------
-def create_torch_dataset(options: Values, params: Dict) -> SpatailOmicsDataset:
+def create_torch_dataset(options: Namespace, params: Dict) -> SpatailOmicsDataset:
     """
     Create torch dataset
     :param params: Dict, input samples
@@ -92,7 +187,10 @@ def create_torch_dataset(options: Values, params: Dict) -> SpatailOmicsDataset:
     info(f'Maximum number of cell in one sample is: {m_nodes}.')
 
     # Step 2: Create torch dataset
-    dataset = SpatailOmicsDataset(root=options.preprocessing_dir, params=params,
-                                  transform=T.ToDense(m_nodes))  # transform edge_index to adj matrix
-    dataset.process()
+    # transform edge_index to padded adj matrix once when processing instead of on every access
+    # sample parsing only runs in worker processes when a worker count is given explicitly
+    dataset = SpatailOmicsDataset(root=options.preprocessing_dir,
+                                  params=params,
+                                  pre_transform=T.ToDense(m_nodes),
+                                  n_workers=getattr(options, 'n_cpu', 1))
     return dataset
@@ -1,7 +1,7 @@
 import io
 import os
 import shutil
-from optparse import Values
+from argparse import Namespace
 from typing import List, Optional
 
 import pandas as pd
@@ -11,13 +11,13 @@ from ..log import *
 from ..model import GraphPooling
 from ..run.processes import NTScore, gnn, niche_network_construct
 from ..train import GPBatchTrain
-from ..optparser._IO import write_io_options_memo
-from ..optparser._create_dataset import write_niche_net_constr_memo
-from ..optparser._train import write_train_options_memo, write_GNN_options_memo, write_NP_options_memo
+from ..optparser._IO import io_options_memo
+from ..optparser._create_dataset import niche_net_constr_memo
+from ..optparser._train import train_options_memo, GNN_options_memo, NP_options_memo
 from ..utils import valid_original_data, save_cell_type_code
 
 
-def io_opt_valid(options: Values, process='ontrac', io_options: Optional[List[str]] = None) -> Values:
+def io_opt_valid(options: Namespace, process='ontrac', io_options: Optional[List[str]] = None) -> Namespace:
     """
     Validate I/O options
     :param options: options
@@ -76,7 +76,7 @@ def io_opt_valid(options: Values, process='ontrac', io_options: Optional[List[st
     return options
 
 
-def niche_net_opt_valid(options: Values, process='ontrac') -> Values:
+def niche_net_opt_valid(options: Namespace, process='ontrac') -> Namespace:
     """
     Validate niche network construction options
     :param options: options
@@ -119,7 +119,7 @@ def niche_net_opt_valid(options: Values, process='ontrac') -> Values:
     return options
         
 
-def gnn_opt_valid(options: Values, process='ontrac') -> Values:
+def gnn_opt_valid(options: Namespace, process='ontrac') -> Namespace:
     """
     Validate GNN options
     :param options: options
@@ -207,6 +207,12 @@ def gnn_opt_valid(options: Values, process='ontrac') -> Values:
     if options.lr < 0:
         raise ValueError(f'Learning rate should be greater than 0. You provided {options.lr}.')
     
+    # mixed_precision
+    if not hasattr(options, 'mixed_precision'):
+        options.mixed_precision = False
+    elif not isinstance(options.mixed_precision, bool):
+        raise ValueError(f'mixed_precision should be a bool. You provided {options.mixed_precision}.')
+    
     # hidden_feats
     if not hasattr(options, 'hidden_feats'):
         options.hidden_feats = 4
@@ -270,7 +276,7 @@ def gnn_opt_valid(options: Values, process='ontrac') -> Values:
     return options    
 
 
-def options_valid(options: Values, process='ontrac') -> Values:
+def options_valid(options: Namespace, process='ontrac') -> Namespace:
     """
     Validate options
     :param options: options
@@ -289,18 +295,20 @@ def options_valid(options: Values, process='ontrac') -> Values:
     # GNN options
     options = gnn_opt_valid(options=options, process=process)
 
-    info('------------------ RUN params memo ------------------ ')
-    write_io_options_memo(options, IO_OPTIONS)
-    write_niche_net_constr_memo(options)
-    write_train_options_memo(options)
-    write_GNN_options_memo(options)
-    write_NP_options_memo(options)
-    info('--------------- RUN params memo end ----------------- ')
+    info_block([
+        '------------------ RUN params memo ------------------ ',
+        *io_options_memo(options, IO_OPTIONS),
+        *niche_net_constr_memo(options),
+        *train_options_memo(options),
+        *GNN_options_memo(options),
+        *NP_options_memo(options),
+        '--------------- RUN params memo end ----------------- ',
+    ])
 
     return options
 
 
-def run_ontrac(options: Values, ori_data_df: pd.DataFrame) -> None:
+def run_ontrac(options: Namespace, ori_data_df: pd.DataFrame) -> None:
     """
     Run ONTraC
     :param options: options
@@ -1,5 +1,6 @@
 import sys
 import time
+from typing import List
 
 
 def get_current_time() -> str:
@@ -12,6 +13,12 @@ def write_direct_message(message: str):
     sys.stdout.flush()
 
 
+def write_direct_messages(messages: List[str]):
+    curr_time_str = get_current_time()
+    sys.stdout.write(''.join(f'{curr_time_str} --- {message}\n' for message in messages))
+    sys.stdout.flush()
+
+
 def debug(message: str):
     write_direct_message(f'DEBUG: {message}')
 
@@ -20,6 +27,10 @@ def info(message: str):
     write_direct_message(f'INFO: {message}')
 
 
+def info_block(messages: List[str]):
+    write_direct_messages([f'INFO: {message}' for message in messages])
+
+
 def write_direct_message_err(message: str):
     curr_time_str = get_current_time()
     sys.stderr.write(f'{curr_time_str} --- {message}\n')
@@ -38,4 +49,4 @@ def critical(message: str):
     write_direct_message_err(f'CRITICAL: {message}')
 
 
-__all__ = ['debug', 'info', 'warning', 'error', 'critical']
+__all__ = ['debug', 'info', 'info_block', 'warning', 'error', 'critical']
@@ -1,4 +1,5 @@
-from optparse import Values
+from concurrent.futures import ProcessPoolExecutor
+from argparse import Namespace
 from typing import Any, Dict, List, Tuple
 
 import numpy as np
@@ -10,13 +11,16 @@ from scipy.spatial import cKDTree
 from ..log import *
 
 
-def build_knn_network(options: Values, sample_data_df: pd.DataFrame,
-                      sample_name: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+def build_knn_network(options: Namespace,
+                      sample_data_df: pd.DataFrame,
+                      sample_name: str,
+                      n_workers: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
     """
     Build KNN network for a sample
-    :param options: Values, options
+    :param options: Namespace, options
     :param sample_data_df: pd.DataFrame, sample data
     :param sample_name: str, sample name
+    :param n_workers: int, number of threads used for the kNN query
     :param save: bool, save indices matrix or not
     :return: Tuple[np.ndarray, np.ndarray, np.ndarray] (coordinates, dis_matrix, indices_matrix)
     """
@@ -27,16 +31,17 @@ def build_knn_network(options: Values, sample_data_df: pd.DataFrame,
     coordinates = sample_data_df[['x', 'y']].values
     kdtree = cKDTree(data=coordinates)
     dis_matrix, indices_matrix = kdtree.query(x=coordinates,
-                                              k=np.max([options.n_neighbors, options.n_local]) + 1)  # include self
+                                              k=np.max([options.n_neighbors, options.n_local]) + 1,
+                                              workers=n_workers)  # include self
 
     return coordinates, dis_matrix, indices_matrix
 
 
-def calc_edge_index(options: Values, sample_data_df: pd.DataFrame, indices_matrix: np.ndarray,
+def calc_edge_index(options: Namespace, sample_data_df: pd.DataFrame, indices_matrix: np.ndarray,
                     sample_name: str) -> np.ndarray:
     """
     Calculate edge index
-    :param options: Values, options
+    :param options: Namespace, options
     :param sample_data_df: pd.DataFrame, sample data
     :param coordinates: np.ndarray, coordinates
     :param indices_matrix: np.ndarray, indices matrix
@@ -48,17 +53,17 @@ def calc_edge_index(options: Values, sample_data_df: pd.DataFrame, indices_matri
 
     N = sample_data_df.shape[0]
 
-    # save edge index file
-    # 1) convert edge index to csr_matrix
+    # 1) use kNN indices as the csr_matrix structure directly, each row has exactly k neighbors
     # 2) make it bidirectional
-    # 3) convert it to edge index back
-    # 4) save it
-    src_indices = np.repeat(np.arange(sample_data_df.shape[0]), options.n_neighbors)
+    # 3) convert it to edge index back in row-major order
     dst_indices = indices_matrix[:, 1:options.n_neighbors + 1].flatten()  # remove self, N x k, #niche x #cell
-    adj_matrix = csr_matrix((np.ones(dst_indices.shape[0]), (src_indices, dst_indices)),
+    indptr = np.arange(0, N * options.n_neighbors + 1, options.n_neighbors)
+    adj_matrix = csr_matrix((np.ones(dst_indices.shape[0], dtype=np.int8), dst_indices, indptr),
                             shape=(N, N))  # convert to csr_matrix
     adj_matrix = adj_matrix + adj_matrix.transpose()  # make it bidirectional
-    edge_index = np.argwhere(adj_matrix > 0)  # convert it to edge index back
+    adj_matrix.sort_indices()  # keep edges in row-major order
+    adj_coo = adj_matrix.tocoo()  # convert it to edge index back, only touch the non-zero entries
+    edge_index = np.column_stack([adj_coo.row, adj_coo.col])
 
     return edge_index
 
@@ -73,11 +78,11 @@ def gauss_dist_1d(dist: np.ndarray, n_local: int) -> float:
     return np.exp(-(dist / dist[n_local])**2)
 
 
-def calc_niche_weight_matrix(options: Values, sample_data_df: pd.DataFrame, dis_matrix: np.ndarray,
+def calc_niche_weight_matrix(options: Namespace, sample_data_df: pd.DataFrame, dis_matrix: np.ndarray,
                              indices_matrix: np.ndarray, sample_name: str) -> csr_matrix:
     """
     Calculate niche_weight_matrix and normalize it using self node and n_local-th neighbor using a gaussian kernel
-    :param options: Values, options
+    :param options: Namespace, options
     :param sample_data_df: pd.DataFrame, sample data
     :param coordinates: np.ndarray, coordinates
     :param dis_matrix: np.ndarray, distance matrix
@@ -117,20 +122,23 @@ def calc_cell_type_composition(sample_data_df: pd.DataFrame, niche_weight_matrix
     N = sample_data_df.shape[0]
 
     # calculate cell type composition
-    cell_to_niche_matrix = niche_weight_matrix / niche_weight_matrix.sum(axis=1)  # N x N, #niche x #cell
-    one_hot_matrix = np.zeros(shape=(N, sample_data_df['Cell_Type'].cat.categories.shape[0]))  # N x #cell_type
-    one_hot_matrix[np.arange(N), sample_data_df.Cell_Type.cat.codes.values] = 1
-    cell_type_composition = cell_to_niche_matrix @ one_hot_matrix  # N x n_cell_type
+    # row normalization on the non-zero entries only, keep it sparse
+    cell_to_niche_matrix = csr_matrix(niche_weight_matrix, copy=True)  # N x N, #niche x #cell
+    cell_to_niche_matrix.data /= np.repeat(np.asarray(niche_weight_matrix.sum(axis=1)).ravel(),
+                                           np.diff(cell_to_niche_matrix.indptr))
+    one_hot_matrix = csr_matrix((np.ones(N), (np.arange(N), sample_data_df.Cell_Type.cat.codes.values)),
+                                shape=(N, sample_data_df['Cell_Type'].cat.categories.shape[0]))  # N x #cell_type
+    cell_type_composition = (cell_to_niche_matrix @ one_hot_matrix).toarray()  # N x n_cell_type
 
     return cell_type_composition
 
 
-def save_niche_network(options: Values, sample_data_df: pd.DataFrame, sample_name: str, indices_matrix: np.ndarray,
+def save_niche_network(options: Namespace, sample_data_df: pd.DataFrame, sample_name: str, indices_matrix: np.ndarray,
                        edge_index: np.ndarray, niche_weight_matrix: csr_matrix,
                        cell_type_composition: np.ndarray) -> None:
     """
     Save the results to disk.
-    :param options: Values, options
+    :param options: Namespace, options
     :param ori_data_df: pd.DataFrame, original data
     :param sample_name: str, sample name
     """
@@ -144,7 +152,8 @@ def save_niche_network(options: Values, sample_data_df: pd.DataFrame, sample_nam
     neighbor_indices_file = f'{options.preprocessing_dir}/{sample_name}_NeighborIndicesMatrix.csv.gz'
     np.savetxt(fname=neighbor_indices_file, X=indices_matrix, delimiter=',')  # save indices matrix
     edge_index_file = f'{options.preprocessing_dir}/{sample_name}_EdgeIndex.csv.gz'
-    np.savetxt(edge_index_file, edge_index, delimiter=',', fmt='%d')  # save edge index
+    pd.DataFrame(edge_index).to_csv(edge_index_file, header=False, index=False,
+                                    compression='gzip')  # save edge index
 
     # save niche_weight_matrix
     niche_weight_file = f'{options.preprocessing_dir}/{sample_name}_NicheWeightMatrix.npz'
@@ -155,12 +164,16 @@ def save_niche_network(options: Values, sample_data_df: pd.DataFrame, sample_nam
     np.savetxt(fname=cell_type_composition_file, X=cell_type_composition, delimiter=',')
 
 
-def construct_niche_network_sample(options: Values, sample_data_df: pd.DataFrame, sample_name: str) -> None:
+def construct_niche_network_sample(options: Namespace,
+                                   sample_data_df: pd.DataFrame,
+                                   sample_name: str,
+                                   n_workers: int = 1) -> None:
     """
     Construct niche network for a sample
-    :param options: Values, options
+    :param options: Namespace, options
     :param sample_data_df: pd.DataFrame, sample data
     :param sample_name: str, sample name
+    :param n_workers: int, number of threads used for the kNN query
     :return: None
 
     1) get coordinates and save it.
@@ -176,7 +189,8 @@ def construct_niche_network_sample(options: Values, sample_data_df: pd.DataFrame
     # build kNN network
     coordinates, dis_matrix, indices_matrix = build_knn_network(options=options,
                                                                 sample_data_df=sample_data_df,
-                                                                sample_name=sample_name)
+                                                                sample_name=sample_name,
+                                                                n_workers=n_workers)
 
     # calculate edge index
     edge_index = calc_edge_index(options=options,
@@ -205,7 +219,7 @@ def construct_niche_network_sample(options: Values, sample_data_df: pd.DataFrame
                        cell_type_composition=cell_type_composition)
 
 
-def construct_niche_network(options: Values, ori_data_df: pd.DataFrame) -> None:
+def construct_niche_network(options: Namespace, ori_data_df: pd.DataFrame) -> None:
     """
     Construct niche network
     :param ori_data_df: pd.DataFrame, original data
@@ -216,12 +230,31 @@ def construct_niche_network(options: Values, ori_data_df: pd.DataFrame) -> None:
     samples = ori_data_df['Sample'].unique()
 
     # construct niche network for each sample
-    for sample in samples:
-        sample_data_df = ori_data_df[ori_data_df['Sample'] == sample]
-        construct_niche_network_sample(options=options, sample_data_df=sample_data_df, sample_name=sample)
-
-
-def gen_samples_yaml(options: Values, ori_data_df: pd.DataFrame) -> None:
+    n_workers = min(options.n_cpu, len(samples))
+    # share the remaining CPUs among the kNN queries
+    n_query_workers = max(1, options.n_cpu // n_workers)
+    if n_workers > 1:
+        # samples are independent, construct them in parallel
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            futures = [
+                executor.submit(construct_niche_network_sample,
+                                options=options,
+                                sample_data_df=ori_data_df[ori_data_df['Sample'] == sample],
+                                sample_name=sample,
+                                n_workers=n_query_workers) for sample in samples
+            ]
+            for future in futures:
+                future.result()  # raise the exception from worker if any
+    else:
+        for sample in samples:
+            sample_data_df = ori_data_df[ori_data_df['Sample'] == sample]
+            construct_niche_network_sample(options=options,
+                                           sample_data_df=sample_data_df,
+                                           sample_name=sample,
+                                           n_workers=n_query_workers)
+
+
+def gen_samples_yaml(options: Namespace, ori_data_df: pd.DataFrame) -> None:
     """
     Generate samples.yaml
     :param ori_data_df: pd.DataFrame, original data
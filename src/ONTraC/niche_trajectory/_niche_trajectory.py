@@ -1,6 +1,6 @@
 import itertools
 import os
-from optparse import Values
+from argparse import Namespace
 from typing import Dict, List, Tuple
 
 import numpy as np
@@ -10,12 +10,16 @@ from scipy.sparse import load_npz
 
 from ..data import SpatailOmicsDataset
 from ..log import error, info
+from ..utils import get_niche_to_cell_matrix
 
+# number of permutations evaluated at once when searching the niche trajectory path
+PERMUTATION_CHUNK_SIZE = 1 << 16
 
-def load_consolidate_data(options: Values) -> Tuple[ndarray, ndarray]:
+
+def load_consolidate_data(options: Namespace) -> Tuple[ndarray, ndarray]:
     """
     Load consolidate s_array and out_adj_array
-    :param options: Values, options
+    :param options: Namespace, options
     :return: Tuple[ndarray, ndarray], the consolidate s_array and out_adj_array
     """
 
@@ -39,15 +43,24 @@ def get_niche_trajectory_path(niche_adj_matrix: ndarray) -> List[int]:
 
     info('Finding niche trajectory with maximum connectivity using Brute Force.')
 
+    n = len(niche_adj_matrix)
     max_connectivity = float('-inf')
     niche_trajectory_path = []
-    for path in itertools.permutations(range(len(niche_adj_matrix))):
-        connectivity = 0
-        for i in range(len(path) - 1):
-            connectivity += niche_adj_matrix[path[i], path[i + 1]]
-        if connectivity > max_connectivity:
-            max_connectivity = connectivity
-            niche_trajectory_path = list(path)
+    permutations = itertools.permutations(range(n))
+    # evaluate permutations chunk by chunk to bound memory usage
+    while True:
+        paths = np.fromiter(itertools.chain.from_iterable(itertools.islice(permutations, PERMUTATION_CHUNK_SIZE)),
+                            dtype=np.int64).reshape(-1, n)
+        if paths.shape[0] == 0:
+            break
+        # sum edges from left to right, the same order as walking along each path
+        connectivity = np.zeros(paths.shape[0])
+        for i in range(n - 1):
+            connectivity += niche_adj_matrix[paths[:, i], paths[:, i + 1]]
+        best = connectivity.argmax()  # first path with maximum connectivity in this chunk
+        if connectivity[best] > max_connectivity:
+            max_connectivity = connectivity[best]
+            niche_trajectory_path = paths[best].tolist()
 
     return niche_trajectory_path
 
@@ -62,11 +75,8 @@ def trajectory_path_to_NC_score(niche_trajectory_path: List[int]) -> ndarray:
     info('Calculating NTScore for each niche cluster based on the trajectory path.')
 
     niche_NT_score = np.zeros(len(niche_trajectory_path))
-    values = np.linspace(0, 1, len(niche_trajectory_path))
-
-    for i, index in enumerate(niche_trajectory_path):
-        # debug(f'i: {i}, index: {index}')
-        niche_NT_score[index] = values[i]
+    # the i-th niche cluster along the path gets the i-th evenly spaced value
+    niche_NT_score[np.asarray(niche_trajectory_path, dtype=np.intp)] = np.linspace(0, 1, len(niche_trajectory_path))
     return niche_NT_score
 
 
@@ -112,9 +122,7 @@ def niche_to_cell_NTScore(dataset: SpatailOmicsDataset, rel_params: Dict,
 
         # niche to cell matrix
         niche_weight_matrix = load_npz(rel_params['Data'][i]['NicheWeightMatrix'])
-        niche_to_cell_matrix = (
-            niche_weight_matrix /
-            niche_weight_matrix.sum(axis=0)).T  # normalize by the all niches associated with each cell, N x N
+        niche_to_cell_matrix = get_niche_to_cell_matrix(niche_weight_matrix)  # N x N, sparse
 
         # cell-level NTScore
         niche_level_NTScore_ = niche_level_NTScore[slice_].reshape(-1, 1)  # N x 1
@@ -127,11 +135,11 @@ def niche_to_cell_NTScore(dataset: SpatailOmicsDataset, rel_params: Dict,
     return cell_level_NTScore, all_niche_level_NTScore_dict, all_cell_level_NTScore_dict
 
 
-def NTScore_table(options: Values, rel_params: Dict, all_niche_level_NTScore_dict: Dict[str, ndarray],
+def NTScore_table(options: Namespace, rel_params: Dict, all_niche_level_NTScore_dict: Dict[str, ndarray],
                   all_cell_level_NTScore_dict: Dict[str, ndarray]) -> None:
     """
     Generate NTScore table and save it
-    :param options: Values, options
+    :param options: Namespace, options
     :param rel_params: Dict, relative paths
     :param all_niche_level_NTScore_dict: Dict[str, ndarray], all niche-level NTScore dict
     :param all_cell_level_NTScore_dict: Dict[str, ndarray], all cell-level NTScore dict
@@ -140,12 +148,14 @@ def NTScore_table(options: Values, rel_params: Dict, all_niche_level_NTScore_dic
 
     info('Output NTScore tables.')
 
-    NTScore_table = pd.DataFrame()
+    NTScore_df_list = []
     for sample in rel_params['Data']:
         coordinates_df = pd.read_csv(sample['Coordinates'], index_col=0)
         coordinates_df['Niche_NTScore'] = all_niche_level_NTScore_dict[sample['Name']]
         coordinates_df['Cell_NTScore'] = all_cell_level_NTScore_dict[sample['Name']]
         coordinates_df.to_csv(f'{options.NTScore_dir}/{sample["Name"]}_NTScore.csv.gz')
-        NTScore_table = pd.concat([NTScore_table, coordinates_df])
+        NTScore_df_list.append(coordinates_df)
 
+    # concatenate once instead of copying the growing table for each sample
+    NTScore_table = pd.concat(NTScore_df_list)
     NTScore_table.to_csv(f'{options.NTScore_dir}/NTScore.csv.gz')
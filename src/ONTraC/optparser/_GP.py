@@ -1,6 +1,7 @@
 import os
 import sys
-from optparse import OptionParser, Values
+from argparse import ArgumentParser, Namespace
+from functools import lru_cache
 
 from ..log import *
 from ..version import __version__
@@ -16,11 +17,12 @@ IO_OPTIONS = ['dataset', 'preprocessing_dir', 'GNN_dir', 'NTScore_dir']
 # ------------------------------------
 # Functions
 # ------------------------------------
-def prepare_GP_optparser() -> OptionParser:
+@lru_cache(maxsize=None)
+def prepare_GP_optparser() -> ArgumentParser:
     """
     Prepare optparser object. New options will be added in thisfunction first.
     """
-    usage = f'''USAGE: %prog <-d DATASET> <--preprocessing-dir PREPROCESSING_DIR> <--GNN-dir GNN_DIR> <--NTScore-dir NTSCORE_DIR> 
+    usage = f'''%(prog)s <-d DATASET> <--preprocessing-dir PREPROCESSING_DIR> <--GNN-dir GNN_DIR> <--NTScore-dir NTSCORE_DIR> 
     [--device DEVICE] [--epochs EPOCHS] [--patience PATIENCE] [--min-delta MIN_DELTA] [--min-epochs MIN_EPOCHS] [--batch-size BATCH_SIZE] 
     [-s SEED] [--seed SEED] [--lr LR] [--hidden-feats HIDDEN_FEATS] [-k K_CLUSTERS]
     [--modularity-loss-weight MODULARITY_LOSS_WEIGHT] [--purity-loss-weight PURITY_LOSS_WEIGHT] 
@@ -28,10 +30,8 @@ def prepare_GP_optparser() -> OptionParser:
     description = 'GP (Graph Pooling): GNN & Node Pooling'
 
     # option processor
-    optparser = OptionParser(version=f'%prog {__version__}',
-                             description=description,
-                             usage=usage,
-                             add_help_option=True)
+    optparser = ArgumentParser(description=description, usage=usage, add_help=True)
+    optparser.add_argument('--version', action='version', version=f'%(prog)s {__version__}')
 
     # I/O options group
     add_IO_options_group(optparser=optparser, io_options=IO_OPTIONS)
@@ -44,23 +44,25 @@ def prepare_GP_optparser() -> OptionParser:
     return optparser
 
 
-def opt_GP_validate(optparser: OptionParser) -> Values:
-    """Validate options from a OptParser object.
+def opt_GP_validate(optparser: ArgumentParser) -> Namespace:
+    """Validate options from a ArgumentParser object.
 
     Ret: Validated options object.
     """
 
-    (options, args) = optparser.parse_args()
+    options = optparser.parse_args()
 
     validate_io_options(optparser, options, IO_OPTIONS)
     validate_train_options(optparser, options)
 
-    info('------------------ RUN params memo ------------------ ')
     # print parameters to stdout
-    write_io_options_memo(options, IO_OPTIONS)
-    write_train_options_memo(options)
-    write_GNN_options_memo(options)
-    write_NP_options_memo(options)
-    info('--------------- RUN params memo end ----------------- ')
+    info_block([
+        '------------------ RUN params memo ------------------ ',
+        *io_options_memo(options, IO_OPTIONS),
+        *train_options_memo(options),
+        *GNN_options_memo(options),
+        *NP_options_memo(options),
+        '--------------- RUN params memo end ----------------- ',
+    ])
 
     return options
@@ -1,43 +1,75 @@
 import os
+import stat
 import sys
-from optparse import OptionGroup, OptionParser, Values
+from argparse import ArgumentParser, Namespace
 from typing import List, Optional
 
 from ..log import *
 
 
-def add_IO_options_group(optparser: OptionParser, io_options: Optional[List[str]]) -> None:
+def add_IO_options_group(optparser: ArgumentParser, io_options: Optional[List[str]]) -> None:
     """
     Add I/O options group to optparser.
-    :param optparser: OptionParser object.
+    :param optparser: ArgumentParser object.
     :param io_options: List of I/O options.
-    :return: OptionGroup object.
+    :return: None.
     """
     if io_options is None:
         return
     # I/O options group
-    group_io = OptionGroup(optparser, "IO")
+    group_io = optparser.add_argument_group("IO")
     if 'dataset' in io_options:
-        group_io.add_option('-d', '--dataset', dest='dataset', type='string', help='Original input dataset.')
+        group_io.add_argument('-d', '--dataset', dest='dataset', type=str, help='Original input dataset.')
     if 'preprocessing_dir' in io_options:
-        group_io.add_option('--preprocessing-dir',
-                            dest='preprocessing_dir',
-                            type='string',
-                            help='Directory for preprocessing outputs.')
+        group_io.add_argument('--preprocessing-dir',
+                              dest='preprocessing_dir',
+                              type=str,
+                              help='Directory for preprocessing outputs.')
     if 'GNN_dir' in io_options:
-        group_io.add_option('--GNN-dir', dest='GNN_dir', type='string', help='Directory for the GNN output.')
+        group_io.add_argument('--GNN-dir', dest='GNN_dir', type=str, help='Directory for the GNN output.')
     if 'NTScore_dir' in io_options:
-        group_io.add_option('--NTScore-dir', dest='NTScore_dir', type='string', help='Directory for the NTScore output.')
+        group_io.add_argument('--NTScore-dir', dest='NTScore_dir', type=str, help='Directory for the NTScore output.')
 
-    optparser.add_option_group(group_io)
+
+def _stat_or_none(path: str) -> Optional[os.stat_result]:
+    """
+    Stat a path once.
+    :param path: str, the path.
+    :return: os.stat_result or None if the path does not exist.
+    """
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
 
 
-def validate_io_options(optparser: OptionParser,
-                        options: Values,
+def validate_output_dir(optparser: ArgumentParser, dir_path: str, overwrite_validation: bool = True) -> None:
+    """
+    Validate an output directory and create it if it does not exist.
+    :param optparser: ArgumentParser object.
+    :param dir_path: str, the output directory.
+    :param overwrite_validation: Overwrite validation flag.
+    :return: None
+    """
+    # existence and kind share a single stat call
+    dir_stat = _stat_or_none(dir_path)
+    if dir_stat is None:
+        info(f'Creating directory: {dir_path}')
+        os.makedirs(dir_path, exist_ok=True)
+    elif not stat.S_ISDIR(dir_stat.st_mode):
+        error(f'The directory ({dir_path}) you given already exists but is not a directory.')
+        optparser.print_help()
+        sys.exit(1)
+    elif overwrite_validation:
+        warning(f'The directory ({dir_path}) you given already exists. It will be overwritten.')
+
+
+def validate_io_options(optparser: ArgumentParser,
+                        options: Namespace,
                         io_options: Optional[List[str]],
                         overwrite_validation: bool = True) -> None:
-    """Validate IO options from a OptParser object.
-    :param optparser: OptionParser object.
+    """Validate IO options from a ArgumentParser object.
+    :param optparser: ArgumentParser object.
     :param options: Options object.
     :param io_options: List of I/O options.
     :param overwrite_validation: Overwrite validation flag.
@@ -50,7 +82,8 @@ def validate_io_options(optparser: OptionParser,
             error('Please provide a dataset.')
             optparser.print_help()
             sys.exit(1)
-        if not os.path.isfile(options.dataset):
+        dataset_stat = _stat_or_none(options.dataset)
+        if dataset_stat is None or not stat.S_ISREG(dataset_stat.st_mode):
             error(f'The input file ({options.dataset}) you given does not exist.')
             optparser.print_help()
             sys.exit(1)
@@ -64,59 +97,38 @@ def validate_io_options(optparser: OptionParser,
             error('Please provide a directory for preprocessing outputs.')
             optparser.print_help()
             sys.exit(1)
-        if os.path.isdir(options.preprocessing_dir):
-            if overwrite_validation:
-                warning(
-                    f'The directory ({options.preprocessing_dir}) you given already exists. It will be overwritten.')
-            else:
-                pass
-        else:
-            info(f'Creating directory: {options.preprocessing_dir}')
-            os.makedirs(options.preprocessing_dir, exist_ok=True)
+        validate_output_dir(optparser, options.preprocessing_dir, overwrite_validation)
 
     if 'GNN_dir' in io_options:
         if not options.GNN_dir:
             error('Please provide a directory for the GNN output.')
             optparser.print_help()
             sys.exit(1)
-        if os.path.isdir(options.GNN_dir):
-            if overwrite_validation:
-                warning(f'The directory ({options.GNN_dir}) you given already exists. It will be overwritten.')
-            else:
-                pass
-        else:
-            info(f'Creating directory: {options.GNN_dir}')
-            os.makedirs(options.GNN_dir, exist_ok=True)
+        validate_output_dir(optparser, options.GNN_dir, overwrite_validation)
 
     if 'NTScore_dir' in io_options:
         if not options.NTScore_dir:
             error('Please provide a directory for the NTScore output.')
             optparser.print_help()
             sys.exit(1)
-        if os.path.isdir(options.NTScore_dir):
-            if overwrite_validation:
-                warning(f'The directory ({options.NTScore_dir}) you given already exists. It will be overwritten.')
-            else:
-                pass
-        else:
-            info(f'Creating directory: {options.NTScore_dir}')
-            os.makedirs(options.NTScore_dir, exist_ok=True)
+        validate_output_dir(optparser, options.NTScore_dir, overwrite_validation)
 
 
-def write_io_options_memo(options: Values, io_options: Optional[List[str]]) -> None:
-    """Write IO options to stdout.
+def io_options_memo(options: Namespace, io_options: Optional[List[str]]) -> List[str]:
+    """Get IO options memo lines.
     :param options: Options object.
     :param io_options: List of I/O options.
-    :return: None
+    :return: List of memo lines.
     """
     if io_options is None:
-        return
-    info('            -------- I/O options -------             ')
+        return []
+    memo = ['            -------- I/O options -------             ']
     if 'preprocessing_dir' in io_options:
-        info(f'preprocessing output directory:  {options.preprocessing_dir}')
+        memo.append(f'preprocessing output directory:  {options.preprocessing_dir}')
     if 'GNN_dir' in io_options:
-        info(f'GNN output directory:  {options.GNN_dir}')
+        memo.append(f'GNN output directory:  {options.GNN_dir}')
     if 'NTScore_dir' in io_options:
-        info(f'NTScore output directory:  {options.NTScore_dir}')
+        memo.append(f'NTScore output directory:  {options.NTScore_dir}')
     if 'dataset' in io_options:
-        info(f'dataset: {options.dataset}')
+        memo.append(f'dataset: {options.dataset}')
+    return memo
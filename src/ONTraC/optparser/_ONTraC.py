@@ -1,8 +1,9 @@
-from optparse import OptionGroup, OptionParser, Values
+from argparse import ArgumentParser, Namespace
+from functools import lru_cache
 
 from ..log import *
 from ..version import __version__
-from ._create_dataset import add_niche_net_constr_options_group, validate_niche_net_constr_options, write_niche_net_constr_memo
+from ._create_dataset import add_niche_net_constr_options_group, niche_net_constr_memo, validate_niche_net_constr_options
 from ._IO import *
 from ._train import *
 
@@ -15,11 +16,12 @@ IO_OPTIONS = ['dataset', 'preprocessing_dir', 'GNN_dir', 'NTScore_dir']
 # ------------------------------------
 # Functions
 # ------------------------------------
-def prepare_ontrac_optparser() -> OptionParser:
+@lru_cache(maxsize=None)
+def prepare_ontrac_optparser() -> ArgumentParser:
     """
     Prepare optparser object. New options will be added in this function first.
     """
-    usage = f'''USAGE: %prog <-d DATASET> <--preprocessing-dir PREPROCESSING_DIR> <--GNN-dir GNN_DIR> <--NTScore-dir NTSCORE_DIR>
+    usage = f'''%(prog)s <-d DATASET> <--preprocessing-dir PREPROCESSING_DIR> <--GNN-dir GNN_DIR> <--NTScore-dir NTSCORE_DIR>
     [--n-cpu N_CPU] [--n-neighbors N_NEIGHBORS] [--n-local N_LOCAL] [--device DEVICE] [--epochs EPOCHS] [--patience PATIENCE]
     [--min-delta MIN_DELTA] [--min-epochs MIN_EPOCHS] [--batch-size BATCH_SIZE] [-s SEED] [--seed SEED] [--lr LR]
     [--hidden-feats HIDDEN_FEATS] [-k K_CLUSTERS] [--modularity-loss-weight MODULARITY_LOSS_WEIGHT]
@@ -27,10 +29,8 @@ def prepare_ontrac_optparser() -> OptionParser:
     description = 'All steps of ONTraC including dataset creation, Graph Pooling, and NT score calculation.'
 
     # option processor
-    optparser = OptionParser(version=f'%prog {__version__}',
-                             description=description,
-                             usage=usage,
-                             add_help_option=True)
+    optparser = ArgumentParser(description=description, usage=usage, add_help=True)
+    optparser.add_argument('--version', action='version', version=f'%(prog)s {__version__}')
 
     # I/O options group
     add_IO_options_group(optparser=optparser, io_options=IO_OPTIONS)
@@ -46,12 +46,12 @@ def prepare_ontrac_optparser() -> OptionParser:
     return optparser
 
 
-def opt_ontrac_validate(optparser) -> Values:
-    """Validate options from a OptParser object.
+def opt_ontrac_validate(optparser) -> Namespace:
+    """Validate options from a ArgumentParser object.
 
     Ret: Validated options object.
     """
-    (options, args) = optparser.parse_args()
+    options = optparser.parse_args()
 
     # IO
     validate_io_options(optparser=optparser, options=options, io_options=IO_OPTIONS)
@@ -62,12 +62,14 @@ def opt_ontrac_validate(optparser) -> Values:
     validate_NP_options(optparser, options)
 
     # print parameters to stdout
-    info('------------------ RUN params memo ------------------ ')
-    write_io_options_memo(options, IO_OPTIONS)
-    write_niche_net_constr_memo(options)
-    write_train_options_memo(options)
-    write_GNN_options_memo(options)
-    write_NP_options_memo(options)
-    info('--------------- RUN params memo end ----------------- ')
+    info_block([
+        '------------------ RUN params memo ------------------ ',
+        *io_options_memo(options, IO_OPTIONS),
+        *niche_net_constr_memo(options),
+        *train_options_memo(options),
+        *GNN_options_memo(options),
+        *NP_options_memo(options),
+        '--------------- RUN params memo end ----------------- ',
+    ])
 
     return options
@@ -1,5 +1,7 @@
 import sys
-from optparse import OptionGroup, OptionParser, Values
+from argparse import ArgumentParser, Namespace
+from functools import lru_cache
+from typing import List
 
 from ..log import *
 from ..version import __version__
@@ -14,42 +16,41 @@ IO_OPTIONS = ['dataset', 'preprocessing_dir']
 # ------------------------------------
 # Functions
 # ------------------------------------
-def add_niche_net_constr_options_group(optparser: OptionParser) -> None:
+def add_niche_net_constr_options_group(optparser: ArgumentParser) -> None:
     """
     Add niche network construction options group to optparser.
-    :param optparser: OptionParser object.
-    :return: OptionGroup object.
+    :param optparser: ArgumentParser object.
+    :return: None.
     """
     # niche network construction options group
-    group_niche = OptionGroup(optparser, "Niche Network Construction")
-    group_niche.add_option('--n-cpu',
-                           dest='n_cpu',
-                           type='int',
-                           default=4,
-                           help='Number of CPUs used for parallel computing in dataset preprocessing. Default is 4.')
-    group_niche.add_option(
+    group_niche = optparser.add_argument_group("Niche Network Construction")
+    group_niche.add_argument('--n-cpu',
+                             dest='n_cpu',
+                             type=int,
+                             default=4,
+                             help='Number of CPUs used for parallel computing in dataset preprocessing. Default is 4.')
+    group_niche.add_argument(
         '--n-neighbors',
         dest='n_neighbors',
-        type='int',
+        type=int,
         default=50,
         help=
         'Number of neighbors used for kNN graph construction. It should be less than the number of cells in each sample. Default is 50.'
     )
-    group_niche.add_option(
+    group_niche.add_argument(
         '--n-local',
         dest='n_local',
-        type='int',
+        type=int,
         default=20,
         help=
         'Specifies the nth closest local neighbors used for gaussian distance normalization. It should be less than the number of cells in each sample. Default is 20.'
     )
-    optparser.add_option_group(group_niche)
 
 
-def validate_niche_net_constr_options(optparser: OptionParser, options: Values) -> None:
+def validate_niche_net_constr_options(optparser: ArgumentParser, options: Namespace) -> None:
     """
     Validate niche network construction options.
-    :param optparser: OptionParser object.
+    :param optparser: ArgumentParser object.
     :param options: Options object.
     """
     if options.n_cpu < 1:
@@ -68,30 +69,33 @@ def validate_niche_net_constr_options(optparser: OptionParser, options: Values)
         sys.exit(1)
 
 
-def write_niche_net_constr_memo(options: Values):
-    """Write niche network construction memos to stdout.
+def niche_net_constr_memo(options: Namespace) -> List[str]:
+    """Get niche network construction memo lines.
 
     Args:
         options: Options object.
     """
 
-    # print parameters to stdout
-    info('      -------- niche net constr options -------      ')
-    info(f'n_cpu:   {options.n_cpu}')
-    info(f'n_neighbors: {options.n_neighbors}')
-    info(f'n_local: {options.n_local}')
+    return [
+        '      -------- niche net constr options -------      ',
+        f'n_cpu:   {options.n_cpu}',
+        f'n_neighbors: {options.n_neighbors}',
+        f'n_local: {options.n_local}',
+    ]
 
 
-def prepare_create_ds_optparser() -> OptionParser:
+@lru_cache(maxsize=None)
+def prepare_create_ds_optparser() -> ArgumentParser:
     """
     Prepare optparser object. New options will be added in thisfunction first.
     """
 
-    usage = f'''USAGE: %prog <-d DATASET> <--preprocessing-dir PREPROCESSING_DIR> [--n-cpu N_CPU] [--n-neighbors N_NEIGHBORS] [--n-local N_LOCAL]'''
+    usage = f'''%(prog)s <-d DATASET> <--preprocessing-dir PREPROCESSING_DIR> [--n-cpu N_CPU] [--n-neighbors N_NEIGHBORS] [--n-local N_LOCAL]'''
     description = 'Create dataset for follwoing analysis.'
 
     # option processor
-    optparser = OptionParser(version=f'%prog {__version__}', description=description, usage=usage, add_help_option=True)
+    optparser = ArgumentParser(description=description, usage=usage, add_help=True)
+    optparser.add_argument('--version', action='version', version=f'%(prog)s {__version__}')
 
     # I/O options group
     add_IO_options_group(optparser=optparser, io_options=IO_OPTIONS)
@@ -102,21 +106,23 @@ def prepare_create_ds_optparser() -> OptionParser:
     return optparser
 
 
-def opt_create_ds_validate(optparser) -> Values:
-    """Validate options from a OptParser object.
+def opt_create_ds_validate(optparser) -> Namespace:
+    """Validate options from a ArgumentParser object.
 
     Ret: Validated options object.
     """
 
-    (options, args) = optparser.parse_args()
+    options = optparser.parse_args()
 
     validate_io_options(optparser=optparser, options=options, io_options=IO_OPTIONS)
     validate_niche_net_constr_options(optparser, options)
 
     # print parameters to stdout
-    info('------------------ RUN params memo ------------------ ')
-    write_io_options_memo(options, IO_OPTIONS)
-    write_niche_net_constr_memo(options)
-    info('--------------- RUN params memo end ----------------- ')
+    info_block([
+        '------------------ RUN params memo ------------------ ',
+        *io_options_memo(options, IO_OPTIONS),
+        *niche_net_constr_memo(options),
+        '--------------- RUN params memo end ----------------- ',
+    ])
 
     return options
@@ -1,199 +1,202 @@
+import os
 import sys
-from optparse import OptionGroup, OptionParser, Values
-from random import randint
-
-import torch
+from argparse import ArgumentParser, Namespace, _ArgumentGroup
+from typing import List, Optional
 
 from ..log import *
 
 
-def add_train_options_group(optparser: OptionParser) -> OptionGroup:
+# ------------------------------------
+# Constants
+# ------------------------------------
+# (flags, dest, type, default, help)
+TRAIN_OPTIONS = (
+    (('--device', ), 'device', str, None,
+     'Device for training. We support cpu and cuda now. Auto select if not specified.'),
+    (('--epochs', ), 'epochs', int, 1000, 'Number of maximum epochs for training. Default is 1000.'),
+    (('--patience', ), 'patience', int, 100, 'Number of epochs wait for better result. Default is 100.'),
+    (('--min-delta', ), 'min_delta', float, 0.001, 'Minimum delta for better result. Default is 0.001'),
+    (('--min-epochs', ), 'min_epochs', int, 50,
+     'Minimum number of epochs for training. Default is 50. Set to 0 to disable.'),
+    (('--batch-size', ), 'batch_size', int, 0, 'Batch size for training. Default is 0 for whole dataset.'),
+    (('-s', '--seed'), 'seed', int, None, 'Random seed for training. Default is random.'),
+    (('--lr', ), 'lr', float, 0.03, 'Learning rate for training. Default is 0.03.'),
+)
+NP_OPTIONS = (
+    (('-k', '--k-clusters'), 'k', int, 6, 'Number of niche clusters. Default is 6.'),
+    (('--modularity-loss-weight', ), 'modularity_loss_weight', float, 0.3,
+     'Weight for modularity loss. Default is 0.3.'),
+    (('--purity-loss-weight', ), 'purity_loss_weight', float, 300, 'Weight for purity loss. Default is 300.'),
+    (('--regularization-loss-weight', ), 'regularization_loss_weight', float, 0.1,
+     'Weight for regularization loss. Default is 0.1.'),
+    (('--beta', ), 'beta', float, 0.03, 'Beta value control niche cluster assignment matrix. Default is 0.03.'),
+)
+
+
+# ------------------------------------
+# Functions
+# ------------------------------------
+def add_options_from_table(group: _ArgumentGroup, options_table: tuple) -> None:
+    """
+    Register options described by a table of (flags, dest, type, default, help) entries.
+    :param group: _ArgumentGroup object.
+    :param options_table: tuple of option entries.
+    :return: None.
+    """
+    for flags, dest, type_, default, help_ in options_table:
+        group.add_argument(*flags, dest=dest, type=type_, default=default, help=help_)
+
+
+def add_train_options_group(optparser: ArgumentParser) -> _ArgumentGroup:
     """
     Add train options group to optparser.
-    :param optparser: OptionParser object.
-    :return: OptionGroup object.
+    :param optparser: ArgumentParser object.
+    :return: _ArgumentGroup object.
     """
     # overall train options group
-    group_train = OptionGroup(optparser, "Options for GNN training")
-    optparser.add_option_group(group_train)
-    group_train.add_option('--device',
-                           dest='device',
-                           type='string',
-                           help='Device for training. We support cpu and cuda now. Auto select if not specified.')
-    group_train.add_option('--epochs',
-                           dest='epochs',
-                           type='int',
-                           default=1000,
-                           help='Number of maximum epochs for training. Default is 1000.')
-    group_train.add_option('--patience',
-                           dest='patience',
-                           type='int',
-                           default=100,
-                           help='Number of epochs wait for better result. Default is 100.')
-    group_train.add_option('--min-delta',
-                           dest='min_delta',
-                           type='float',
-                           default=0.001,
-                           help='Minimum delta for better result. Default is 0.001')
-    group_train.add_option('--min-epochs',
-                           dest='min_epochs',
-                           type='int',
-                           default=50,
-                           help='Minimum number of epochs for training. Default is 50. Set to 0 to disable.')
-    group_train.add_option('--batch-size',
-                           dest='batch_size',
-                           type='int',
-                           default=0,
-                           help='Batch size for training. Default is 0 for whole dataset.')
-    group_train.add_option('-s', '--seed', dest='seed', type='int', help='Random seed for training. Default is random.')
-    group_train.add_option('--lr',
-                           dest='lr',
-                           type='float',
-                           default=0.03,
-                           help='Learning rate for training. Default is 0.03.')
+    group_train = optparser.add_argument_group("Options for GNN training")
+    add_options_from_table(group_train, TRAIN_OPTIONS)
+    group_train.add_argument('--mixed-precision',
+                             dest='mixed_precision',
+                             action='store_true',
+                             default=False,
+                             help='Use mixed precision (float16) training. Only takes effect on cuda device. '
+                             'The pooling losses are partly computed in float16.')
     return group_train
 
 
-def add_GNN_options_group(group_train: OptionGroup) -> None:
+def add_GNN_options_group(group_train: _ArgumentGroup) -> None:
     """
     Add GNN options group to optparser.
-    :param optparser: OptionParser object.
+    :param group_train: _ArgumentGroup object.
     :return: None.
     """
 
     # GNN options group
-    group_train.add_option('--hidden-feats',
-                           dest='hidden_feats',
-                           type='int',
-                           default=4,
-                           help='Number of hidden features. Default is 4.')
+    group_train.add_argument('--hidden-feats',
+                             dest='hidden_feats',
+                             type=int,
+                             default=4,
+                             help='Number of hidden features. Default is 4.')
 
 
-def add_NP_options_group(group_train: OptionGroup) -> None:
+def add_NP_options_group(group_train: _ArgumentGroup) -> None:
     """
     Add Node Pooling options group to optparser.
-    :param optparser: OptionParser object.
+    :param group_train: _ArgumentGroup object.
     :return: None.
     """
 
     # NP options group
-    group_train.add_option('-k',
-                           '--k-clusters',
-                           dest='k',
-                           type='int',
-                           default=6,
-                           help='Number of niche clusters. Default is 6.')
-    group_train.add_option('--modularity-loss-weight',
-                           dest='modularity_loss_weight',
-                           type='float',
-                           default=0.3,
-                           help='Weight for modularity loss. Default is 0.3.')
-    group_train.add_option('--purity-loss-weight',
-                           dest='purity_loss_weight',
-                           type='float',
-                           default=300,
-                           help='Weight for purity loss. Default is 300.')
-    group_train.add_option('--regularization-loss-weight',
-                           dest='regularization_loss_weight',
-                           type='float',
-                           default=0.1,
-                           help='Weight for regularization loss. Default is 0.1.')
-    group_train.add_option('--beta',
-                           dest='beta',
-                           type='float',
-                           default=0.03,
-                           help='Beta value control niche cluster assignment matrix. Default is 0.03.')
-
-
-def validate_train_options(optparser: OptionParser, options: Values) -> Values:
+    add_options_from_table(group_train, NP_OPTIONS)
+
+
+def _resolve_device(device: Optional[str]) -> str:
+    """
+    Resolve the device used for training.
+    :param device: str or None, user specified device.
+    :return: str, the device to use.
+    """
+    # torch is slow to import, only load it when options are validated
+    import torch
+
+    if device is None:
+        info('Device not specified, choose automatically.')
+    elif device.startswith('cpu'):
+        return device
+    elif device.startswith('cuda'):
+        if torch.cuda.is_available():
+            return device
+        warning('CUDA is not available, use CPU instead.')
+        return 'cpu'
+    else:
+        warning(f'Invalid device {device}! Choose automatically.')
+    if torch.cuda.is_available():
+        return 'cuda'
+    # elif torch.backends.mps.is_available():  # TODO: MPS compatibility with torch_geometric.data.InMemoryDataset
+    #     return 'mps'
+    return 'cpu'
+
+
+def validate_train_options(optparser: ArgumentParser, options: Namespace) -> Namespace:
     """
     Validate train options.
-    :param optparser: OptionParser object.
+    :param optparser: ArgumentParser object.
     :param options: Options object.
     :return: Validated options object.
     """
 
     # device
-    if options.device is None:
-        info('Device not specified, choose automatically.')
-    elif options.device.startswith(('cuda', 'cpu')):
-        if options.device.startswith('cuda') and not torch.cuda.is_available():
-            warning('CUDA is not available, use CPU instead.')
-            options.device = 'cpu'
-    else:
-        warning(f'Invalid device {options.device}! Choose automatically.')
-        options.device = None
-    if options.device is None:
-        if torch.cuda.is_available():
-            options.device = 'cuda'
-        # elif torch.backends.mps.is_available():  # TODO: MPS compatibility with torch_geometric.data.InMemoryDataset
-        #     options.device = 'mps'
-        else:
-            options.device = 'cpu'
-    
+    options.device = _resolve_device(options.device)
+
     # determin random seed
-    if getattr(options, 'seed') is None:
-        options.seed = randint(0, 10000)
+    if options.seed is None:
+        options.seed = int.from_bytes(os.urandom(2), 'little') % 10001
 
     return options
 
 
-def validate_NP_options(optparser: OptionParser, options: Values) -> Values:
+def validate_NP_options(optparser: ArgumentParser, options: Namespace) -> Namespace:
     """
     Validate Node Pooling options.
-    :param optparser: OptionParser object.
+    :param optparser: ArgumentParser object.
     :param options: Options object.
     :return: Validated options object.
     """
 
     # check k
-    if getattr(options, 'k') < 2:
+    if options.k < 2:
         error(f'k must be greater than 1, exit!')
         sys.exit(1)
 
     return options
 
 
-def write_train_options_memo(options: Values) -> None:
+def train_options_memo(options: Namespace) -> List[str]:
     """
-    Write train options memo to stdout.
+    Get train options memo lines.
     :param options: Options object.
-    :return: None.
+    :return: List of memo lines.
     """
 
-    info('           -------- train options -------            ')
-    info(f'device:  {options.device}')
-    info(f'epochs:  {options.epochs}')
-    info(f'batch_size:  {options.batch_size}')
-    info(f'patience:  {options.patience}')
-    info(f'min_delta:  {options.min_delta}')
-    info(f'min_epochs:  {options.min_epochs}')
-    info(f'seed:  {options.seed}')
-    info(f'lr:  {options.lr}')
+    return [
+        '           -------- train options -------            ',
+        f'device:  {options.device}',
+        f'epochs:  {options.epochs}',
+        f'batch_size:  {options.batch_size}',
+        f'patience:  {options.patience}',
+        f'min_delta:  {options.min_delta}',
+        f'min_epochs:  {options.min_epochs}',
+        f'seed:  {options.seed}',
+        f'lr:  {options.lr}',
+        f'mixed_precision:  {options.mixed_precision}',
+    ]
 
 
-def write_GNN_options_memo(options: Values) -> None:
+def GNN_options_memo(options: Namespace) -> List[str]:
     """
-    Write GNN options memo to stdout.
+    Get GNN options memo lines.
     :param options: Options object.
-    :return: None.
+    :return: List of memo lines.
     """
 
-    info(f'hidden_feats:  {options.hidden_feats}')
+    return [f'hidden_feats:  {options.hidden_feats}']
 
 
-def write_NP_options_memo(options: Values) -> None:
+def NP_options_memo(options: Namespace) -> List[str]:
     """
-    Write Node Pooling options memo to stdout.
+    Get Node Pooling options memo lines.
     :param options: Options object.
-    :return: None.
+    :return: List of memo lines.
     """
 
-    info(f'k:  {options.k}')
-    info(f'modularity_loss_weight:  {options.modularity_loss_weight}')
-    info(f'purity_loss_weight:  {options.purity_loss_weight}')
-    info(f'regularization_loss_weight:  {options.regularization_loss_weight}')
-    info(f'beta:  {options.beta}')
+    return [
+        f'k:  {options.k}',
+        f'modularity_loss_weight:  {options.modularity_loss_weight}',
+        f'purity_loss_weight:  {options.purity_loss_weight}',
+        f'regularization_loss_weight:  {options.regularization_loss_weight}',
+        f'beta:  {options.beta}',
+    ]
 
 
 __all__ = [
@@ -202,7 +205,7 @@ __all__ = [
     'add_NP_options_group',
     'validate_train_options',
     'validate_NP_options',
-    'write_train_options_memo',
-    'write_GNN_options_memo',
-    'write_NP_options_memo',
+    'train_options_memo',
+    'GNN_options_memo',
+    'NP_options_memo',
 ]
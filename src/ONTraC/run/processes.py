@@ -1,4 +1,4 @@
-from optparse import Values
+from argparse import Namespace
 from typing import Callable, List, Optional, Type
 
 import numpy as np
@@ -15,7 +15,7 @@ from ..train import SubBatchTrainProtocol
 from ..utils import get_rel_params, read_yaml_file
 
 
-def load_parameters(opt_validate_func: Callable, prepare_optparser_func: Callable) -> Values:
+def load_parameters(opt_validate_func: Callable, prepare_optparser_func: Callable) -> Namespace:
     """
     Load parameters
     :param opt_validate_func: validate function
@@ -27,7 +27,7 @@ def load_parameters(opt_validate_func: Callable, prepare_optparser_func: Callabl
     return options
 
 
-def niche_network_construct(options: Values, ori_data_df: pd.DataFrame) -> None:
+def niche_network_construct(options: Namespace, ori_data_df: pd.DataFrame) -> None:
     """
     Niche network construct process
     :param options: options
@@ -44,7 +44,7 @@ def niche_network_construct(options: Values, ori_data_df: pd.DataFrame) -> None:
     info('------------ Niche network construct end ------------ ')
 
 
-def gnn(options: Values, ori_data_df: pd.DataFrame, nn_model: Type[torch.nn.Module],
+def gnn(options: Namespace, ori_data_df: pd.DataFrame, nn_model: Type[torch.nn.Module],
         BatchTrain: Type[SubBatchTrainProtocol], inspect_funcs: Optional[List[Callable]]) -> None:
     """
     GNN training and prediction process
@@ -86,7 +86,7 @@ def gnn(options: Values, ori_data_df: pd.DataFrame, nn_model: Type[torch.nn.Modu
     info('--------------------- GNN end ---------------------- ')
 
 
-def NTScore(options: Values) -> None:
+def NTScore(options: Namespace) -> None:
     """
     Pseudotime calculateion process
     :param options: options
@@ -1,5 +1,9 @@
+import math
+import os
 from abc import ABC, abstractmethod
-from typing import Callable, Dict, List, Optional, Protocol, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Protocol, Tuple
 
 import numpy as np
 import torch
@@ -12,7 +16,7 @@ from ONTraC.utils.decorators import selective_args_decorator
 from ..log import debug
 from ..utils import round_epoch_filter
 from ..utils.decorators import selective_args_decorator
-from .loss_funs import masked_variance, within_cluster_variance_loss
+from .loss_funs import within_cluster_variance_loss
 
 
 class BatchTrain(ABC):
@@ -24,6 +28,15 @@ class BatchTrain(ABC):
         self.device: torch.device = device
         self.data_loader: DataLoader = data_loader
         self.model = self.model.to(device=self.device)
+        # opt-in: compile only the forward pass, the state dict keys of the model stay unchanged
+        # reduce-overhead relies on CUDA graphs, CPU uses the default mode
+        if os.environ.get('ONTRAC_COMPILE', '0') == '1' and hasattr(torch, 'compile'):
+            compile_mode = 'reduce-overhead' if torch.device(self.device).type == 'cuda' else 'default'
+            self.model.forward = torch.compile(self.model.forward, mode=compile_mode, dynamic=False)
+        # checkpoints during training are written by a background thread from a CPU copy of the parameters
+        self._io_pool: Optional[ThreadPoolExecutor] = None
+        self._pending_save: Optional[Future] = None
+        self._cpu_mirror: Optional[Dict[str, Tensor]] = None
 
     def __str__(self):
         return f"{self.__class__.__name__}(model='{self.model}', device='{self.device}', data_loader='{self.data_loader}')"
@@ -44,28 +57,80 @@ class BatchTrain(ABC):
         self.model.train()
         min_loss = np.inf
         patience = 0
-        best_params = self.model.state_dict()
+        # training ends on the parameters of the last epoch
+        # with early stopping, the best parameters are kept in a buffer allocated once and updated in place on
+        # improvement, and restored only when the loss becomes NaN
+        # max_patience == 0 means no early stopping, no buffer is kept and a NaN loss leaves the model as it is
+        best_params = None
+        if max_patience != 0:
+            best_params = {key: value.detach().clone() for key, value in self.model.state_dict().items()}
+        # epochs to save checkpoints, decided once instead of per epoch
+        output_dir = kwargs.get('output')
+        save_epochs = frozenset(e for e in range(max_epochs) if round_epoch_filter(e)) if output_dir else frozenset()
 
         for epoch in range(max_epochs):
             train_loss = self.train_epoch(epoch=epoch)
             if np.isnan(train_loss):  # unexpected situation
-                best_params = self.model.state_dict()
+                if best_params is not None:
+                    self.model.load_state_dict(best_params)
                 break
-            elif max_patience == 0:  # no early stopping
-                best_params = self.model.state_dict()
-            elif min_loss - train_loss < min_loss * min_delta:  # no improvement
-                patience += 1
-            else:  # improvement
-                min_loss = train_loss
-                patience = 0
-                best_params = self.model.state_dict()
-            # max_patience == 0 means no early stopping
-            if max_patience != 0 and patience >= max_patience and epoch >= min_epochs:
-                break
-            if round_epoch_filter(epoch) and 'output' in kwargs:
-                output_dir = kwargs['output']
-                self.save(f'{output_dir}/epoch_{epoch + 1}.pt')
-        self.model.load_state_dict(best_params)
+            if best_params is not None:
+                if min_loss - train_loss < min_loss * min_delta:  # no improvement
+                    patience += 1
+                else:  # improvement
+                    min_loss = train_loss
+                    patience = 0
+                    for key, value in self.model.state_dict().items():
+                        best_params[key].copy_(value)
+                if patience >= max_patience and epoch >= min_epochs:
+                    break
+            if epoch in save_epochs:
+                self.save_async(f'{output_dir}/epoch_{epoch + 1}.pt')
+        self.wait_save()
+
+    def iter_device_batches(self) -> Iterator[Data]:
+        """
+        Iterate over the data loader and move each batch to the device.
+        On CUDA, the next batch is copied on a side stream while the current batch is being processed.
+        :return: Iterator of batches on the device.
+        """
+        if torch.device(self.device).type != 'cuda':
+            for data in self.data_loader:
+                yield data.to(self.device)
+            return
+
+        copy_stream = torch.cuda.Stream(device=self.device)
+        compute_stream = torch.cuda.current_stream(device=self.device)
+
+        def _prefetch(data: Optional[Data]) -> Optional[Data]:
+            if data is None:
+                return None
+            with torch.cuda.stream(copy_stream):
+                return data.to(self.device, non_blocking=True)
+
+        loader_iter = iter(self.data_loader)
+        next_data = _prefetch(next(loader_iter, None))
+        while next_data is not None:
+            compute_stream.wait_stream(copy_stream)
+            data = next_data
+            # tensors allocated on the copy stream are now used by the compute stream
+            for _, value in data:
+                if isinstance(value, Tensor):
+                    value.record_stream(compute_stream)
+            next_data = _prefetch(next(loader_iter, None))
+            yield data
+
+    @contextmanager
+    def _eval_mode(self) -> Iterator[None]:
+        """
+        Switch the model to evaluation mode and restore the previous mode on exit.
+        """
+        was_training = self.model.training
+        self.model.eval()
+        try:
+            yield
+        finally:
+            self.model.train(was_training)
 
     @abstractmethod
     def set_train_args(self) -> None:
@@ -83,8 +148,7 @@ class BatchTrain(ABC):
         raise NotImplementedError("The evaluate method should be implemented by subclasses.")
 
     def predict(self, data: Data) -> Tuple[Tensor, ...] | Tensor:
-        self.model.eval()
-        with torch.no_grad():
+        with self._eval_mode(), torch.inference_mode():
             res = self.model.predict(data.x, data.adj, data.mask)  # type: ignore
         return res
 
@@ -96,8 +160,44 @@ class BatchTrain(ABC):
     def save(self, path: str) -> None:
         torch.save(self.model.state_dict(), path)
 
+    def save_async(self, path: str) -> None:
+        """
+        Save the model parameters on a background thread.
+        The parameters are copied to CPU before returning, so training can continue to update them.
+        :param path: str, the path to save the model parameters.
+        """
+        # the CPU copy of the previous checkpoint may still be in use
+        self.wait_save()
+        state_dict = self.model.state_dict()
+        if torch.device(self.device).type == 'cuda':
+            # reuse a pinned CPU mirror and copy all parameters with a single synchronization
+            if self._cpu_mirror is None:
+                self._cpu_mirror = {
+                    key: torch.empty_like(value, device='cpu', pin_memory=True)
+                    for key, value in state_dict.items()
+                }
+            for key, value in state_dict.items():
+                self._cpu_mirror[key].copy_(value.detach(), non_blocking=True)
+            torch.cuda.current_stream(device=self.device).synchronize()
+            snapshot = self._cpu_mirror
+        else:
+            snapshot = {key: value.detach().clone() for key, value in state_dict.items()}
+        if self._io_pool is None:
+            self._io_pool = ThreadPoolExecutor(max_workers=1)
+        self._pending_save = self._io_pool.submit(torch.save, snapshot, path)
+
+    def wait_save(self) -> None:
+        """
+        Wait for the pending background save to finish and raise its error if any.
+        """
+        if self._pending_save is not None:
+            pending_save, self._pending_save = self._pending_save, None
+            pending_save.result()
+
     def load(self, path: str) -> None:
-        self.model.load_state_dict(torch.load(path))
+        # memory-map the file and load tensors straight onto the device, parameters only
+        state_dict = torch.load(path, map_location=self.device, mmap=True, weights_only=True)
+        self.model.load_state_dict(state_dict)
 
 
 class SubBatchTrainProtocol(Protocol):
@@ -133,83 +233,116 @@ class GPBatchTrain(BatchTrain):
                        purity_loss_weight: float = 0,
                        regularization_loss_weight: float = 1,
                        ortho_loss_weight: float = 0,
-                       inspect_funcs: Optional[List[Callable]] = None) -> None:
+                       inspect_funcs: Optional[List[Callable]] = None,
+                       mixed_precision: bool = False) -> None:
         self.optimizer = optimizer
         self.spectral_loss_weight = modularity_loss_weight
         self.ortho_loss_weight = ortho_loss_weight
         self.cluster_loss_weight = regularization_loss_weight
         self.feat_similarity_loss_weight = purity_loss_weight
         self.inspect_funcs = inspect_funcs
+        # weights of spectral, ortho, cluster, and feature similarity loss, applied in one multiplication
+        # stored with the dtype and on the device of the model parameters, so no conversion happens per batch
+        param = next(self.model.parameters())
+        loss_weights = [
+            self.spectral_loss_weight,
+            self.ortho_loss_weight * math.sqrt(2),
+            self.cluster_loss_weight / (math.sqrt(self.model.k) - 1),
+            self.feat_similarity_loss_weight,
+        ]
+        self.loss_weights = torch.tensor(loss_weights, dtype=param.dtype, device=param.device)
+        # float16 autocast with gradient scaling, only supported on CUDA
+        self.mixed_precision = mixed_precision and torch.device(self.device).type == 'cuda'
+        self.scaler = torch.cuda.amp.GradScaler(enabled=self.mixed_precision)
 
     def cal_loss(self, spectral_loss, ortho_loss, cluster_loss, data, s) -> Tuple[Tensor, ...]:
-        spectral_loss = self.spectral_loss_weight * spectral_loss
-        ortho_loss = self.ortho_loss_weight * ortho_loss * np.sqrt(2)
-        cluster_loss = self.cluster_loss_weight * cluster_loss / (np.sqrt(self.model.k) - 1)
         feat_similarity_loss = within_cluster_variance_loss(x=data.x, s=s, mask=data.mask)
-        total_var = masked_variance(x=data.x, mask=data.mask)
-        feat_similarity_loss = self.feat_similarity_loss_weight * feat_similarity_loss
-        loss = spectral_loss + ortho_loss + cluster_loss + feat_similarity_loss
+        raw_losses = torch.stack([spectral_loss, ortho_loss, cluster_loss, feat_similarity_loss])
+        weighted_losses = raw_losses * self.loss_weights
+        loss = weighted_losses.sum()
+        spectral_loss, ortho_loss, cluster_loss, feat_similarity_loss = weighted_losses.unbind()
 
         return loss, spectral_loss, ortho_loss, cluster_loss, feat_similarity_loss
 
-    def train_epoch(self, epoch: int) -> float:
-        self.model.train()
-        train_loss = 0
-        for batch, data in enumerate(self.data_loader):
-            # debug(f'epoch {epoch+1}, batch {batch+1} start.')
-            data = data.to(self.device)
+    def _train_step(self, data: Data) -> Tuple[Tensor, ...]:
+        """
+        Run forward and backward pass on one batch and update the parameters.
+        :param data: Data, the batch on the device.
+        :return: s, out, out_adj, loss, spectral_loss, ortho_loss, cluster_loss, feat_similarity_loss
+        """
+        self.optimizer.zero_grad(set_to_none=True)
+        with torch.autocast(device_type='cuda', dtype=torch.float16, enabled=self.mixed_precision):
             s, out, out_adj, spectral_loss, ortho_loss, cluster_loss = self.model(data.x, data.adj, data.mask)
-            loss, spectral_loss, ortho_loss, cluster_loss, feat_similarity_loss = self.cal_loss(
-                spectral_loss, ortho_loss, cluster_loss, data, s)
-            loss.backward()
-            self.optimizer.step()
-            self.optimizer.zero_grad()
-            # debug(f'epoch {epoch+1}, batch {batch+1} end.')
-            if self.inspect_funcs is not None:
-                for inspect_func in self.inspect_funcs:
-                    inspect_func(
-                        epoch=epoch + 1,
-                        batch=batch + 1,
-                        data=data,
-                        s=s,
-                        out=out,
-                        out_adj=out_adj,
-                        loss=loss,
-                        modularity_loss=spectral_loss,
-                        # ortho_loss=ortho_loss,
-                        purity_loss=feat_similarity_loss,
-                        regularization_loss=cluster_loss,)
-            train_loss += loss.item()
+        # spectral, ortho and cluster losses are computed by the pooling layer inside the autocast region:
+        # their matmuls run in float16, while autocast keeps reductions such as sum, norm and softmax in float32
+        # only the feature similarity loss and the loss weighting below run fully in float32
+        if self.mixed_precision:
+            s = s.float()
+            spectral_loss, ortho_loss, cluster_loss = spectral_loss.float(), ortho_loss.float(), cluster_loss.float()
+        loss, spectral_loss, ortho_loss, cluster_loss, feat_similarity_loss = self.cal_loss(
+            spectral_loss, ortho_loss, cluster_loss, data, s)
+        self.scaler.scale(loss).backward()
+        self.scaler.step(self.optimizer)
+        self.scaler.update()
+        return s, out, out_adj, loss, spectral_loss, ortho_loss, cluster_loss, feat_similarity_loss
+
+    def _train_epoch_fast(self) -> Tensor:
+        # accumulate on the device and synchronize once per epoch
+        train_loss = torch.zeros((), dtype=torch.float64, device=self.device)
+        for data in self.iter_device_batches():
+            loss = self._train_step(data)[3]
+            train_loss += loss.detach()
+        return train_loss
+
+    def _train_epoch_inspect(self, epoch: int) -> Tensor:
+        train_loss = torch.zeros((), dtype=torch.float64, device=self.device)
+        # one keyword dict for all batches and inspect functions, its fields are updated in place
+        inspect_ctx: Dict[str, Any] = {'epoch': epoch + 1}
+        for batch, data in enumerate(self.iter_device_batches()):
+            s, out, out_adj, loss, spectral_loss, ortho_loss, cluster_loss, feat_similarity_loss = self._train_step(
+                data)
+            inspect_ctx.update(
+                batch=batch + 1,
+                data=data,
+                s=s,
+                out=out,
+                out_adj=out_adj,
+                loss=loss,
+                modularity_loss=spectral_loss,
+                # ortho_loss=ortho_loss,
+                purity_loss=feat_similarity_loss,
+                regularization_loss=cluster_loss,)
+            for inspect_func in self.inspect_funcs:  # type: ignore
+                inspect_func(**inspect_ctx)
+            train_loss += loss.detach()
         return train_loss
 
+    def train_epoch(self, epoch: int) -> float:
+        # the inspect-free path skips the batch counter and per-batch inspect branch
+        if self.inspect_funcs is None:
+            return self._train_epoch_fast().item()
+        return self._train_epoch_inspect(epoch=epoch).item()
+
     def evaluate(self) -> Dict[str, np.floating]:
         """
         Evaluate the model.
         :return: results_dict
         """
-        spectral_loss_list, ortho_loss_list, cluster_loss_list = [], [], []
-        # bin_spectral_loss_list, bin_ortho_loss_list, bin_cluster_loss_list = [], [], []
-        feat_similarity_loss_list = []
-        loss_list = []
-        self.model.eval()
-        with torch.no_grad():
-            for data in self.data_loader:
-                data = data.to(self.device)
+        # accumulate spectral, cluster, feature similarity and total loss on the device
+        # and synchronize once after all batches
+        loss_sums = torch.zeros(4, dtype=torch.float64, device=self.device)
+        n_batches = 0
+        with self._eval_mode(), torch.inference_mode():
+            for data in self.iter_device_batches():
                 s, out, out_adj, spectral_loss, ortho_loss, cluster_loss = self.model.evaluate(
                     data.x, data.adj, data.mask)
                 loss, spectral_loss, ortho_loss, cluster_loss, feat_similarity_loss = self.cal_loss(
                     spectral_loss, ortho_loss, cluster_loss, data, s)
 
-                spectral_loss_list.append(spectral_loss.item())
-                # ortho_loss_list.append(ortho_loss.item())
-                cluster_loss_list.append(cluster_loss.item())
-                feat_similarity_loss_list.append(feat_similarity_loss.item())
-                loss_list.append(loss.item())
-        spectral_loss = np.mean(spectral_loss_list)
-        # ortho_loss = np.mean(ortho_loss_list)
-        cluster_loss = np.mean(cluster_loss_list)
-        feat_similarity_loss = np.mean(feat_similarity_loss_list)
-        loss = np.mean(loss_list)
+                # ortho loss is not reported
+                loss_sums += torch.stack([spectral_loss, cluster_loss, feat_similarity_loss, loss])
+                n_batches += 1
+        spectral_loss, cluster_loss, feat_similarity_loss, loss = (loss_sums / n_batches).cpu().numpy()
         results_dict = {
             'modularity_loss': spectral_loss,
             'purity_loss': feat_similarity_loss,
@@ -220,15 +353,13 @@ class GPBatchTrain(BatchTrain):
         return results_dict
 
     def predict_dict(self, data: Data) -> Dict[str, Tensor]:
-        self.model.eval()
-        with torch.no_grad():
+        with self._eval_mode(), torch.inference_mode():
             s, out, out_adj = self.model.predict(data.x, data.adj, data.mask)
             z = self.model.predict_embed(data.x, data.adj, data.mask)
         return {'z': z, 's': s, 'out': out, 'out_adj': out_adj}
 
     def predict_embed(self, data: Data) -> Tensor:
-        self.model.eval()
-        with torch.no_grad():
+        with self._eval_mode(), torch.inference_mode():
             z = self.model.predict_embed(data.x, data.adj, data.mask)  # type: ignore
         return z
 
@@ -1,10 +1,13 @@
+import gzip
 import sys
 from copy import deepcopy
-from optparse import Values
-from typing import Dict
+from argparse import Namespace
+from typing import Dict, Optional
 
+import numpy as np
 import pandas as pd
 import yaml
+from scipy.sparse import csr_matrix, spmatrix
 
 from ..log import warning
 
@@ -31,10 +34,10 @@ def write_version_info() -> None:
     sys.stdout.flush()
 
 
-def save_cell_type_code(options: Values, ori_data_df: pd.DataFrame) -> None:
+def save_cell_type_code(options: Namespace, ori_data_df: pd.DataFrame) -> None:
     """
     Save mappings of the categorical data
-    :param options: Values, options
+    :param options: Namespace, options
     :param ori_data_df: pd.DataFrame, original data
     :return: None
     """
@@ -44,10 +47,10 @@ def save_cell_type_code(options: Values, ori_data_df: pd.DataFrame) -> None:
     cell_type_code.to_csv(f'{options.preprocessing_dir}/cell_type_code.csv', index=False)
 
 
-def valid_original_data(options: Values, ori_data_df: pd.DataFrame) -> pd.DataFrame:
+def valid_original_data(options: Namespace, ori_data_df: pd.DataFrame) -> pd.DataFrame:
     """
     Validate original data
-    :param options: Values, options
+    :param options: Namespace, options
     :param ori_data_df: pd.DataFrame, original data
     :return: pd.DataFrame, original data
 
@@ -92,10 +95,10 @@ def valid_original_data(options: Values, ori_data_df: pd.DataFrame) -> pd.DataFr
     return ori_data_df
 
 
-def load_original_data(options: Values) -> pd.DataFrame:
+def load_original_data(options: Namespace) -> pd.DataFrame:
     """
     Load original data
-    :param options: Values, options
+    :param options: Namespace, options
     :return: pd.DataFrame, original data
     """
 
@@ -115,6 +118,29 @@ def read_yaml_file(yaml_file: str) -> dict:
     return params
 
 
+def read_csv_array(filename: str, dtype: Optional[type] = None) -> np.ndarray:
+    """
+    Read a headerless CSV file (gzip supported) into a 2D numpy array with the pandas C parser
+    :param filename: file name
+    :param dtype: data type of the array
+    :return: np.ndarray
+    """
+    return pd.read_csv(filename, header=None, dtype=dtype).to_numpy()
+
+
+def get_niche_to_cell_matrix(niche_weight_matrix: spmatrix) -> csr_matrix:
+    """
+    Normalize the niche weight matrix by all niches associated with each cell and transpose it, keeping it sparse
+    :param niche_weight_matrix: spmatrix, N x N niche weight matrix
+    :return: csr_matrix, N x N niche to cell matrix
+    """
+    coo = niche_weight_matrix.tocoo()
+    col_sum = np.asarray(niche_weight_matrix.sum(axis=0)).ravel()
+    col_sum[col_sum == 0] = 1  # cells without any associated niche
+    # swap rows and columns to get the transposed matrix directly
+    return csr_matrix((coo.data / col_sum[coo.col], (coo.col, coo.row)), shape=coo.shape[::-1])
+
+
 def count_lines(filename: str) -> int:
     """
     Count lines of a file
@@ -122,21 +148,23 @@ def count_lines(filename: str) -> int:
     :return: number of lines
     """
     i = 0
-    if filename.endswith('.gz'):
-        import gzip
-        fhd = gzip.open(filename, 'rt')
-    else:
-        fhd = open(filename, 'r')
-    for _ in fhd:
+    last_byte = b'\n'
+    opener = gzip.open if filename.endswith('.gz') else open
+    with opener(filename, 'rb') as fhd:
+        # count newline bytes in large binary chunks instead of iterating over lines
+        for chunk in iter(lambda: fhd.read(1 << 20), b''):
+            i += chunk.count(b'\n')
+            last_byte = chunk[-1:]
+    # last line without a trailing newline
+    if last_byte != b'\n':
         i += 1
-    fhd.close()
     return i
 
 
-def get_rel_params(options: Values, params: Dict) -> Dict:
+def get_rel_params(options: Namespace, params: Dict) -> Dict:
     """
     Get relative paths for params
-    :param options: Values, options
+    :param options: Namespace, options
     :param params: Dict, input samples
     :return: Dict, relative paths
     """
@@ -0,0 +1,12 @@
+import os
+
+# tests run on tiny inputs on CPU, skip CUDA initialization and thread pool start-up
+# set before importing torch so that the thread settings of OpenMP/MKL also take effect
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+os.environ.setdefault('MKL_NUM_THREADS', '1')
+
+import torch
+
+torch.set_num_threads(1)
+torch.set_num_interop_threads(1)
@@ -1,4 +1,4 @@
-from optparse import Values
+from argparse import Namespace
 from pathlib import Path
 
 import numpy as np
@@ -16,9 +16,9 @@ from .utils import temp_dirs
 
 
 @pytest.fixture
-def options() -> Values:
+def options() -> Namespace:
     # Create an options object for testing
-    _options = Values()
+    _options = Namespace()
     _options.dataset = 'tests/_data/test_data.csv'
     _options.preprocessing_dir = 'tests/temp/preprocessing'
     _options.n_local = 2
@@ -27,7 +27,7 @@ def options() -> Values:
 
 
 @pytest.fixture()
-def sample_data_df(options: Values) -> pd.DataFrame:
+def sample_data_df(options: Namespace) -> pd.DataFrame:
     # Create sample data
     sample_data_df = pd.read_csv(options.dataset)
     sample_data_df = sample_data_df[sample_data_df['Sample'] == 'S1']
@@ -109,10 +109,10 @@ def cell_type_composition() -> np.ndarray:
                      [0.58050216, 0.41949784], [0.38996633, 0.61003367]])
 
 
-def test_load_original_data(options: Values) -> None:
+def test_load_original_data(options: Namespace) -> None:
     """
     Test the load_original_data module
-    :param options: Values, options
+    :param options: Namespace, options
     :return: None
     """
 
@@ -150,11 +150,11 @@ def test_load_original_data(options: Values) -> None:
         assert gen_cell_type_code.equals(pd.DataFrame({'Code': [0, 1], 'Cell_Type': ['A', 'B']}))
 
 
-def test_build_knn_network(options: Values, sample_data_df: pd.DataFrame, sample_name: str, dis_matrix: np.ndarray,
+def test_build_knn_network(options: Namespace, sample_data_df: pd.DataFrame, sample_name: str, dis_matrix: np.ndarray,
                            indices_matrix: np.ndarray) -> None:
     """
     Test the build_knn_network function
-    :param options: Values, options
+    :param options: Namespace, options
     :param sample_data_df: pd.DataFrame, sample data
     :param sample_name: str, sample name
     :param dis_matrix: np.ndarray, distance matrix
@@ -187,11 +187,11 @@ def test_build_knn_network(options: Values, sample_data_df: pd.DataFrame, sample
     assert np.array_equal(a1=gen_indices_matrix, a2=indices_matrix)
 
 
-def test_calc_edge_index(options: Values, sample_data_df: pd.DataFrame, sample_name: str, indices_matrix: np.ndarray,
+def test_calc_edge_index(options: Namespace, sample_data_df: pd.DataFrame, sample_name: str, indices_matrix: np.ndarray,
                          edge_index: np.ndarray) -> None:
     """
     Test the calc_edge_index function
-    :param options: Values, options
+    :param options: Namespace, options
     :param sample_data_df: pd.DataFrame, sample data
     :param sample_name: str, sample name
     :param indices_matrix: np.ndarray, indices matrix
@@ -215,11 +215,11 @@ def test_calc_edge_index(options: Values, sample_data_df: pd.DataFrame, sample_n
     assert np.array_equal(gen_edge_index, edge_index)
 
 
-def test_calc_niche_weight_matrix(options: Values, sample_data_df: pd.DataFrame, dis_matrix: np.ndarray,
+def test_calc_niche_weight_matrix(options: Namespace, sample_data_df: pd.DataFrame, dis_matrix: np.ndarray,
                                   indices_matrix: np.ndarray, niche_weight_matrix: csr_matrix) -> None:
     """
     Test the calc_niche_weight_matrix function
-    :param options: Values, options
+    :param options: Namespace, options
     :param sample_data_df: pd.DataFrame, sample data
     :param dis_matrix: np.ndarray, distance matrix
     :param indices_matrix: np.ndarray, indices matrix
@@ -248,7 +248,7 @@ def test_calc_cell_type_composition(sample_data_df: pd.DataFrame, niche_weight_m
                                     cell_type_composition: np.ndarray) -> None:
     """
     Test the calc_cell_type_composition function
-    :param options: Values, options
+    :param options: Namespace, options
     :param sample_data_df: pd.DataFrame, sample data
     :param niche_weight_matrix: csr_matrix, niche weight matrix
     :param cell_type_composition: np.ndarray, cell type composition
@@ -1,14 +1,14 @@
 import os
 import shutil
 from contextlib import contextmanager
-from optparse import Values
+from argparse import Namespace
 
 
 @contextmanager
-def temp_dirs(options: Values):
+def temp_dirs(options: Namespace):
     """
     Create temporary directories for testing
-    :param options: Values, options
+    :param options: Namespace, options
     :return: None
     """
     try: